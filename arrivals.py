@@ -0,0 +1,153 @@
+"""
+Simulation of a stream of drivers arriving at, parking in and leaving a shared carpark over time.
+"""
+from parking import CellType, MultiLevelCarPark
+from driver_base import DriverBase
+from drivers import BottomUpDriver, TopDownDriver
+import heapq
+import numpy as np
+from typing import List, Sequence, Tuple, Type
+
+# one record per arrival
+ARRIVAL_DTYPE = np.dtype([
+    ("time", np.float64),  # arrival time in hours
+    ("driver", np.uint8),  # index into the simulation's driver classes
+    ("search_time", np.int32),  # ticks taken to find a parking space, or to give up
+    ("level", np.int16),  # level of the parking space, or -1 if the driver was turned away
+    ("cell", np.int32),  # flat index (row * width + column) of the parking space, or -1
+])
+
+_ARRIVAL, _DEPARTURE = 0, 1
+
+class ArrivalSimulation:
+    """
+    Drivers arrive at the carpark as a Poisson process at one of its entrances picked uniformly at random, each searching the carpark as it currently is and
+    parking in the space it finds, which is then occupied until the driver leaves after an exponentially
+    distributed stay. The carpark's grid, free parking spaces and per-level free counts are updated
+    incrementally with `occupy` and `vacate` as cars come and go.
+
+    A driver claims its parking space at the moment it arrives rather than once it has driven there,
+    since a search takes seconds and a stay takes hours.
+    """
+    def __init__(
+        self,
+        carpark: MultiLevelCarPark,
+        driver_classes: Sequence[Type[DriverBase]] = (BottomUpDriver, TopDownDriver),
+        mix: Sequence[float] | None = None,
+        arrival_rate: float = 1000.0,
+        mean_stay: float = 2.0,
+        seed: int = 0
+    ) -> None:
+        """
+        Args:
+            carpark: The carpark to simulate, its current occupancy is the starting state.
+            driver_classes: The kinds of driver that arrive.
+            mix: The probability of an arrival being of each kind of driver, uniform if None.
+            arrival_rate: The mean number of arrivals per hour.
+            mean_stay: The mean time in hours a car stays parked.
+            seed: The seed of the arrival, driver and stay random numbers.
+        """
+        self.carpark = carpark
+        self.driver_classes = tuple(driver_classes)
+        self.mix = np.full(len(self.driver_classes), 1 / len(self.driver_classes)) if mix is None else np.asarray(mix) / np.sum(mix)
+        self.arrival_rate = arrival_rate
+        self.mean_stay = mean_stay
+        self.rng = np.random.default_rng(seed)
+        self.time = 0.0
+
+        # one driver of each kind at each entrance, reset for every arrival rather than constructed
+        self._drivers = [
+            [driver_class(carpark, entrance) for entrance in range(len(carpark.entrances))] for driver_class in self.driver_classes
+        ]
+        # (time, event, level, cell), where a departure frees the parking space at (level, cell)
+        self._events: List[Tuple[float, int, int, int]] = []
+        self._close_unreachable_bays()
+        self._schedule_initial_departures()
+        self._schedule_arrival()
+
+    def _close_unreachable_bays(self) -> None:
+        """
+        Take the parking spaces without a ROAD cell next to them out of use for the whole simulation.
+        A driver that spots one of these stops on the road instead of parking, so once one came free it
+        would turn away every driver that saw it, where with a fixed snapshot it only costs a single search.
+        """
+        grid = self.carpark.grid
+        road = np.pad(grid == CellType.ROAD.value, ((0, 0), (1, 1), (1, 1)))
+        beside_road = road[:, :-2, 1:-1] | road[:, 2:, 1:-1] | road[:, 1:-1, :-2] | road[:, 1:-1, 2:]
+
+        cells = self.carpark._vacancy_cells
+        self._closed = cells[~beside_road.reshape(-1)[cells]]
+        levels, closed = np.divmod(self._closed, self.carpark.length * self.carpark.width)
+        for level, cell in zip(levels.tolist(), closed.tolist()):
+            if cell in self.carpark.free_bays[level]:
+                self.carpark.occupy(level, cell)
+
+    def _schedule_initial_departures(self) -> None:
+        # the cars already parked leave over time too, the stays being memoryless
+        cells = np.setdiff1d(self.carpark._vacancy_cells, self._closed)
+        occupied = cells[self.carpark.grid.reshape(-1)[cells] == CellType.OCCUPIED.value]
+        stays = self.rng.exponential(self.mean_stay, size=len(occupied))
+        levels, occupied = np.divmod(occupied, self.carpark.length * self.carpark.width)
+        for stay, level, cell in zip(stays.tolist(), levels.tolist(), occupied.tolist()):
+            self._events.append((self.time + stay, _DEPARTURE, level, cell))
+        heapq.heapify(self._events)
+
+    def _schedule_arrival(self) -> None:
+        heapq.heappush(self._events, (self.time + self.rng.exponential(1 / self.arrival_rate), _ARRIVAL, -1, -1))
+
+    def _arrive(self) -> Tuple[int, int, int, int]:
+        """
+        Send a driver of a random kind into the carpark, parking it if it finds a space.
+
+        Returns:
+            A tuple of (driver index, search time, level, cell), with the level and cell -1 if it found no space.
+        """
+        kind = int(self.rng.choice(len(self._drivers), p=self.mix))
+        entrances = self._drivers[kind]
+        driver = entrances[int(self.rng.integers(len(entrances)))] if len(entrances) > 1 else entrances[0]
+        driver.reset()
+        search_time = driver.search_for_parking(fast=True)
+        level, cell = driver.current_level, driver.cell
+        # only a driver that ends its search on a free parking space parks, whichever way its path to it went
+        if not driver.pathing_to_park or self.carpark.flat_levels[level, cell] != CellType.UNOCCUPIED.value:
+            return kind, search_time, -1, -1
+
+        self.carpark.occupy(level, cell)
+        heapq.heappush(self._events, (self.time + self.rng.exponential(self.mean_stay), _DEPARTURE, level, cell))
+        return kind, search_time, level, cell
+
+    def run(self, hours: float) -> np.ndarray:
+        """
+        Advance the simulation by a number of hours.
+
+        Args:
+            hours: The simulated time to run for.
+
+        Returns:
+            A structured array of `ARRIVAL_DTYPE` with one record per arrival in the period, in order.
+        """
+        end = self.time + hours
+        records = []
+        while self._events[0][0] <= end:
+            self.time, event, level, cell = heapq.heappop(self._events)
+            if event == _DEPARTURE:
+                self.carpark.vacate(level, cell)
+            else:
+                records.append((self.time, *self._arrive()))
+                self._schedule_arrival()
+        self.time = end
+        return np.array(records, dtype=ARRIVAL_DTYPE)
+
+
+if __name__ == "__main__":
+    carpark = MultiLevelCarPark(6, 10, 20)
+    carpark.set_capacity(0.9)
+    simulation = ArrivalSimulation(carpark, arrival_rate=2000, mean_stay=0.5)
+    for hour in range(4):
+        arrivals = simulation.run(1)
+        parked = arrivals["level"] >= 0
+        print(
+            f"Hour {hour + 1}: {len(arrivals)} arrivals, {parked.sum()} parked, "
+            f"mean search time {arrivals['search_time'][parked].mean():.1f}, "
+            f"free spaces per level {carpark.free_counts.tolist()}"
+        )
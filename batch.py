@@ -0,0 +1,122 @@
+"""
+Vectorized simulation of many drivers of the same strategy, each searching its own carpark layout.
+Until a driver sees a free parking space its route only depends on the carpark geometry,
+so every layout is checked along the shared route at once with NumPy operations.
+"""
+from parking import MultiLevelCarPark, CellType
+from driver_base import DriverBase
+from strategies import StrategyDriver
+import numpy as np
+from typing import Iterable, Tuple, Type
+
+# the most cells gathered from the layouts at once, and the most layout cells built at once by `simulate_batch`,
+# so that memory stays bounded on large carparks
+_GATHER_CELLS = 1 << 22
+_LAYOUT_CELLS = 1 << 26
+
+def _search_route(driver_class: Type[DriverBase], carpark: MultiLevelCarPark) -> Tuple[DriverBase, np.ndarray, np.ndarray, np.ndarray]:
+    """
+    Follow the route a driver takes when it never finds a parking space.
+    
+    Returns:
+        A tuple of (the driver, the level of each step, the `FieldOfView` table row of each step,
+        whether each step ends a path at a ramp to another level).
+    """
+    driver = driver_class(carpark)
+    if isinstance(driver, StrategyDriver):
+        # compiled ahead of time
+        return driver, driver.compiled.levels, driver.compiled.rows, driver.compiled.ramps
+
+    levels, rows, ramps = [], [], []
+    while True:
+        steps = driver.path.fov_rows(carpark.width)
+        levels.append(np.full(len(steps), driver.current_level))
+        rows.append(steps)
+        if len(steps):
+            driver.pos = driver.path[-1]
+            driver.direction = driver._directions[steps[-1] % 4]
+            driver.path_index = len(driver.path)
+
+        changed = driver._change_level()
+        ramps.append(np.zeros(len(steps), dtype=bool))
+        if len(steps):
+            ramps[-1][-1] = changed
+        if not changed:
+            break
+
+    return driver, np.concatenate(levels), np.concatenate(rows), np.concatenate(ramps)
+
+def build_layouts(carpark: MultiLevelCarPark, capacity: float, seeds: Iterable[int]) -> np.ndarray:
+    """
+    Build the carpark layout `set_capacity` produces for each seed, without modifying the carpark.
+    
+    Returns:
+        An array of shape (seeds, levels, length * width) of `CellType` values.
+    """
+    base = carpark.flat_levels.copy()
+    base[base == CellType.UNOCCUPIED.value] = CellType.OCCUPIED.value
+    seeds = list(seeds)
+    layouts = np.repeat(base[np.newaxis], len(seeds), axis=0)
+    for layout, seed in zip(layouts, seeds):
+        layout.reshape(-1)[carpark.sample_vacancies(capacity, seed)] = CellType.UNOCCUPIED.value
+    return layouts
+
+def simulate_layouts(driver_class: Type[DriverBase], carpark: MultiLevelCarPark, layouts: np.ndarray) -> np.ndarray:
+    """
+    Simulate a driver searching each of the given layouts of the carpark.
+    
+    Args:
+        driver_class: The strategy of the drivers.
+        carpark: The carpark the layouts are of.
+        layouts: An array of shape (samples, levels, length * width), see `build_layouts`.
+    
+    Returns:
+        An array of the time each driver takes to find a parking space,
+        equal to `search_for_parking()` on the corresponding layout.
+    """
+    driver, levels, rows, ramps = _search_route(driver_class, carpark)
+    table = driver._fov_table
+    times = np.full(len(layouts), len(rows), dtype=np.int64)
+    searching = np.arange(len(layouts))
+
+    # split the route into the paths of each level, and advance all drivers still searching along each in turn,
+    # as many steps at a time as keep the gathered cells within `_GATHER_CELLS`
+    bounds = np.flatnonzero(np.diff(levels, prepend=-1, append=-1))
+    for start, stop in zip(bounds[:-1], bounds[1:]):
+        level = levels[start]
+        while start < stop and len(searching):
+            end = min(stop, start + max(1, _GATHER_CELLS // (len(searching) * table.padded.shape[1])))
+            cells = table.padded[rows[start:end]]
+            free = (layouts[searching, level][:, cells] == CellType.UNOCCUPIED.value) & (cells >= 0)
+            found = free.any(axis=2)
+            hit = found.any(axis=1)
+            steps = found.argmax(axis=1)[hit]
+            parking_spaces = cells[steps, free[hit, steps].argmax(axis=1)]
+            steps += start
+
+            # the rest of the search is the path from where the parking space is seen to the parking space
+            network = driver._road_networks[level]
+            distances = np.array([
+                network.distances(source)[parking_space] for source, parking_space in zip(rows[steps] // 4, parking_spaces)
+            ], dtype=np.int64)
+            # with no path to the parking space the search ends where it is seen, unless there is a ramp to take there
+            times[searching[hit]] = np.where(distances >= 0, steps + 1 + distances, np.where(ramps[steps], len(rows), steps + 1))
+            searching = searching[~hit]
+            start = end
+
+    return times
+
+def simulate_batch(driver_class: Type[DriverBase], carpark: MultiLevelCarPark, capacity: float, seeds: Iterable[int]) -> np.ndarray:
+    """
+    Simulate a driver searching the layout `carpark.set_capacity(capacity, seed)` produces for each seed,
+    building as many layouts at a time as keep them within `_LAYOUT_CELLS` cells.
+    
+    Returns:
+        An array of the time taken to find a parking space for each seed.
+    """
+    seeds = list(seeds)
+    chunk = max(1, _LAYOUT_CELLS // carpark.grid.size)
+    return np.concatenate([np.zeros(0, dtype=np.int64)] + [
+        simulate_layouts(driver_class, carpark, build_layouts(carpark, capacity, seeds[i:i + chunk]))
+        for i in range(0, len(seeds), chunk)
+    ])
@@ -0,0 +1,155 @@
+"""
+Benchmarks of the simulation hot paths over a range of carpark sizes and capacities.
+
+Usage:
+    python benchmark.py                           run the benchmarks and print the results
+    python benchmark.py --save baseline.json      also save the results as a baseline
+    python benchmark.py --compare baseline.json   flag operations that got slower than the baseline
+"""
+from parking import MultiLevelCarPark, CellType
+from drivers import BottomUpDriver, TopDownDriver
+from batch import simulate_batch
+from itertools import cycle
+import argparse
+import json
+import platform
+import sys
+import timeit
+import numpy as np
+from typing import Callable, Dict, Iterator, Sequence, Tuple
+
+SIZES = ((6, 10, 20), (3, 6, 10), (10, 20, 40))
+CAPACITIES = (0.8, 0.95)
+# the fixed seeds whole samples are simulated with, so every run sees the same layouts
+SEEDS = range(64)
+
+def _seconds_per_call(func: Callable[[], object], repeat: int = 3, setup: Callable[[], object] | None = None) -> float:
+    """
+    The best time per call out of `repeat` runs, each long enough (at least 0.2s) to be measured reliably.
+    With a `setup`, it is called untimed before every call, which is then timed on its own,
+    for operations such as `reset_capacity` that would do nothing when called again.
+    """
+    if setup is None:
+        timer = timeit.Timer(func)
+        number, _ = timer.autorange()
+        return min(timer.repeat(repeat, number)) / number
+
+    def seconds(number: int) -> float:
+        total = 0.0
+        for _ in range(number):
+            setup()
+            start = timeit.default_timer()
+            func()
+            total += timeit.default_timer() - start
+        return total
+
+    number = 1
+    while seconds(number) < 0.2:
+        number *= 2
+    return min(seconds(number) for _ in range(repeat)) / number
+
+def _search(driver, carpark: MultiLevelCarPark, capacity: float, seeds: Sequence[int], fast: bool) -> Callable[[], None]:
+    def samples() -> None:
+        for seed in seeds:
+            carpark.set_capacity(capacity, seed=seed)
+            driver.reset()
+            driver.search_for_parking(fast=fast)
+    return samples
+
+def _cases(levels: int, rows: int, cols: int, capacity: float) -> Iterator[Tuple[str, Callable[[], object], int, Callable[[], object] | None]]:
+    """
+    The operations to benchmark on a carpark of the given size and capacity.
+    
+    Yields:
+        Tuples of (name, operation, samples simulated per call, untimed setup before every call or None),
+        where operations that simulate whole samples are timed per sample, `search_for_parking` including
+        `set_capacity` for each.
+    """
+    carpark = MultiLevelCarPark(levels, rows, cols)
+    seeds = cycle(SEEDS)
+    set_capacity = lambda: carpark.set_capacity(capacity, seed=next(seeds))
+    yield "set_capacity", set_capacity, 0, None
+    yield "reset_capacity", carpark.reset_capacity, 0, set_capacity
+
+    for driver_class in (BottomUpDriver, TopDownDriver):
+        name = driver_class.__name__
+        driver = driver_class(carpark)
+        yield f"{name}._generate_path", driver._generate_path, 0, None
+        yield f"{name}._generate_path (uncached)", lambda: (driver._cached_path.cache_clear(), driver._generate_path()), 0, None
+
+        # stop a few cells into the first level, with every parking space in view occupied
+        carpark.reset_capacity()
+        for _ in range(4):
+            driver._tick()
+        yield f"{name}._check_fov", driver._check_fov, 0, None
+        parking_space = max(driver.fov, key=lambda cell: carpark.flat_levels[0][cell] == CellType.OCCUPIED.value)
+        yield f"{name}._calculate_path_to_park", lambda: driver._calculate_path_to_park(divmod(int(parking_space), carpark.width)), 0, None
+
+        yield f"{name}.search_for_parking", _search(driver, carpark, capacity, SEEDS, fast=False), len(SEEDS), None
+        yield f"{name}.search_for_parking (fast)", _search(driver, carpark, capacity, SEEDS, fast=True), len(SEEDS), None
+        yield f"{name} simulate_batch", lambda: simulate_batch(driver_class, carpark, capacity, SEEDS), len(SEEDS), None
+
+def run(sizes=SIZES, capacities=CAPACITIES) -> Dict[str, float]:
+    """
+    Run every benchmark, printing the results as they complete.
+    
+    Returns:
+        A dictionary of the seconds per operation of each benchmark.
+    """
+    results = {}
+    print("Whole samples are timed per sample, the search_for_parking rows including set_capacity for each")
+    for levels, rows, cols in sizes:
+        for capacity in capacities:
+            print(f"\n{levels} levels, {rows}x{cols} bays, capacity {capacity}")
+            for name, func, samples, setup in _cases(levels, rows, cols, capacity):
+                seconds = _seconds_per_call(func, setup=setup) / max(samples, 1)
+                results[f"{levels}x{rows}x{cols}@{capacity} {name}"] = seconds
+                throughput = f"{1 / seconds:12,.0f} samples/s" if samples else ""
+                print(f"  {name:<48}{seconds * 1e6:12.2f} us{throughput}")
+    return results
+
+def compare(results: Dict[str, float], baseline: Dict[str, float], tolerance: float) -> int:
+    """
+    Print how each benchmark changed relative to the baseline.
+    
+    Returns:
+        The number of benchmarks that got slower by more than `tolerance`, as a fraction of the baseline.
+    """
+    regressions = 0
+    print(f"\n{'benchmark':<80}{'baseline':>12}{'now':>12}{'change':>9}")
+    for key, seconds in results.items():
+        if key not in baseline:
+            continue
+        change = seconds / baseline[key] - 1
+        flag = ""
+        if change > tolerance:
+            regressions += 1
+            flag = "  REGRESSION"
+        print(f"{key:<80}{baseline[key] * 1e6:10.2f}us{seconds * 1e6:10.2f}us{change:+9.1%}{flag}")
+    return regressions
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Benchmark the simulation hot paths.")
+    parser.add_argument("--save", metavar="PATH", help="save the results as a JSON baseline")
+    parser.add_argument("--compare", metavar="PATH", help="compare the results against a JSON baseline")
+    parser.add_argument("--tolerance", type=float, default=0.2, help="slowdown flagged as a regression (default: 0.2)")
+    parser.add_argument("--quick", action="store_true", help="only benchmark the first carpark size and capacity")
+    args = parser.parse_args()
+
+    results = run(SIZES[:1], CAPACITIES[:1]) if args.quick else run()
+    if args.save:
+        with open(args.save, "w") as f:
+            json.dump({
+                "python": platform.python_version(),
+                "numpy": np.__version__,
+                "machine": platform.machine(),
+                "results": results,
+            }, f, indent=2)
+    if args.compare:
+        with open(args.compare) as f:
+            baseline = json.load(f)["results"]
+        if compare(results, baseline, args.tolerance):
+            sys.exit(1)
+
+if __name__ == "__main__":
+    main()
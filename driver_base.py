@@ -1,9 +1,13 @@
 from parking import MultiLevelCarPark, CellType
+from geometry import DIRECTIONS, Route, field_of_view, road_network
+from render import FrameRenderer
 from abc import ABC, abstractmethod
-from collections import deque
 from time import sleep
 import sys
-from typing import Tuple, Deque
+import numpy as np
+from typing import Iterable, List, Tuple
+
+_UNOCCUPIED = CellType.UNOCCUPIED.value
 
 class Style():
     RESET = '\033[0m'
@@ -20,13 +24,19 @@ class Style():
         return f"{Style._colors[color]}{text}{Style.RESET}"
 
 class DriverBase(ABC):
-    _directions = (
-        (-1, 0),  # north
-        (0, 1),  # east
-        (1, 0),  # south
-        (0, -1),  # west
+    """
+    The state of a driver is kept in `__slots__`, with positions as flat cell indices (row * width + column)
+    and headings as indices into `DIRECTIONS`, so that a tick only does integer and list lookups.
+    """
+    __slots__ = (
+        "carpark", "entrance", "_fov_table", "_road_networks", "_levels", "_ramps",
+        "current_level", "cell", "heading", "_fov_row", "time", "pathing_to_park", "completed",
+        "path", "path_index", "_steps", "_reach", "recorder",
     )
 
+    _directions = DIRECTIONS
+    _direction_index = {direction: d for d, direction in enumerate(DIRECTIONS)}
+
     _display_map_uncolored = (
         "◇", # road
         "◇", # ramp
@@ -43,104 +53,113 @@ class DriverBase(ABC):
     )
     _cur_pos_symbol = "◈"
 
-    def __init__(self, carpark: MultiLevelCarPark) -> None:
+    def __init__(self, carpark: MultiLevelCarPark, entrance: int = 0) -> None:
+        """
+        Args:
+            carpark: The carpark to search.
+            entrance: The index of the entrance in `carpark.entrances` the driver enters the carpark at.
+        """
+        if not 0 <= entrance < len(carpark.entrances):
+            raise ValueError(f"the carpark has {len(carpark.entrances)} entrances, not an entrance {entrance}")
         self.carpark = carpark
-        self.current_level = 0
-        self.pos = carpark.south_entrance
-        self.direction = (-1, 0)  # north
-        self.fov = []
-        self.time = 0
-        self.pathing_to_park = False
-        self.completed = False
-        self.path = self._generate_path()
+        self.entrance = entrance
+        self._fov_table = field_of_view(carpark.length, carpark.width)
+        self._road_networks = [
+            road_network(carpark.length, carpark.width, (level == CellType.ROAD.value).tobytes())
+            for level in carpark.grid
+        ]
+        # byte views of the levels, which read cells as ints without going through NumPy
+        self._levels = [memoryview(level) for level in carpark.flat_levels]
+
+        self._ramps = carpark.transitions
+        # an optional `TrajectoryRecorder` of every tick
+        self.recorder = None
+        self.reset()
+
+    @property
+    def pos(self) -> Tuple[int, int]:
+        return divmod(self.cell, self.carpark.width)
+
+    @pos.setter
+    def pos(self, pos: Tuple[int, int]) -> None:
+        self.cell = pos[0] * self.carpark.width + pos[1]
+
+    @property
+    def direction(self) -> Tuple[int, int]:
+        return DIRECTIONS[self.heading]
+
+    @direction.setter
+    def direction(self, direction: Tuple[int, int]) -> None:
+        self.heading = self._direction_index[direction]
+
+    @property
+    def fov(self) -> Tuple[int, ...]:
+        """
+        The flat indices of the cells in the driver's FOV when it last checked it.
+        """
+        return self._fov_table.rows[self._fov_row] if self._fov_row >= 0 else ()
 
     def _check_fov(self) -> Tuple[int, int] | None:
         """
         Check within the field of view (FOV) of the driver for parking spaces.
         The FOV is a cone in the direction the driver is facing along with a 1 cell wide ring
-        around the driver's current position.
+        around the driver's current position, looked up in the precomputed `FieldOfView` table.
         
         Returns:
             A tuple of (row, column) if a parking space is found, otherwise None.
         """
+        self._fov_row = 4 * self.cell + self.heading
+        parking_space = self._find_parking()
+        return divmod(parking_space, self.carpark.width) if parking_space >= 0 else None
 
-        self.fov.clear()
-        # check perimeter of driver's current position
-        for dy in range(-1, 2):
-            for dx in range(-1, 2):
-                if (dy, dx) == (0, 0):
-                    continue
-                i, j = self.pos[0] + dy, self.pos[1] + dx
-                if self._within_bounds((i, j)):
-                    self.fov.append((i, j))
-        
-        # check cone in the direction the driver is facing
-        dir_index = self._directions.index(self.direction)
-        left_dir, right_dir = self._directions[(dir_index - 1) % 4], self._directions[(dir_index + 1) % 4]
-        for k in range(2, 4):
-            mid = self.pos[0] + k * self.direction[0], self.pos[1] + k * self.direction[1]
-            if self._within_bounds(mid):
-                self.fov.append(mid)
-            
-            l = r = mid
-            for _ in range(k):
-                l = l[0] + left_dir[0], l[1] + left_dir[1]
-                r = r[0] + right_dir[0], r[1] + right_dir[1]
-                if self._within_bounds(l):
-                    self.fov.append(l)
-                if self._within_bounds(r):
-                    self.fov.append(r)
-
-        # check if any of the cells in the FOV are free parking spaces
-        for cell in self.fov:
-            if self.carpark.levels[self.current_level][cell[0]][cell[1]] == CellType.UNOCCUPIED:
-                return cell
-        return None
-            
-    def _within_bounds(self, pos: Tuple[int, int]) -> bool:
+    def _find_parking(self) -> int:
         """
-        Check if the given position is within the bounds of the carpark.
-        
-        Args:
-            pos: A tuple of (row, column) representing the position to check.
+        Find the first free parking space in the FOV last checked.
         
         Returns:
-            True if the position is within bounds, False otherwise.
+            The flat index of the parking space, or -1 if there is none.
         """
-        return 0 <= pos[0] < self.carpark.length and 0 <= pos[1] < self.carpark.width
-    
-    def _calculate_path_to_park(self, pos: Tuple[int, int]) -> Deque[Tuple[int, int]]:
+        level = self._levels[self.current_level]
+        for cell in self._fov_table.rows[self._fov_row]:
+            if level[cell] == _UNOCCUPIED:
+                return cell
+        return -1
+            
+    def _calculate_path_to_park(self, pos: Tuple[int, int]) -> Route:
         """
-        Calculates a path to the parking space using BFS.
+        Calculates a path to the parking space using BFS, reconstructed from the level's cached `RoadNetwork`.
         
         Args:
             pos: A tuple of (row, column) representing the position of the parking space.
         
         Returns:
-            A deque of tuples representing the path to the parking space.
+            A route of tuples representing the path to the parking space.
         """
-        visited = set([self.pos])
-        q = deque([[self.pos]])
-        grid = self.carpark.levels[self.current_level]
-        while q:
-            path = q.popleft()
-            current = path[-1]
-            for dy, dx in self._directions:
-                new_pos = (current[0] + dy, current[1] + dx)
-                if self._within_bounds(new_pos):
-                    if new_pos == pos:
-                        path = deque(path)
-                        path.popleft()
-                        path.append(new_pos)
-                        return path
+        width = self.carpark.width
+        path = self._road_networks[self.current_level].path(self.cell, pos[0] * width + pos[1])
+        return Route(self.pos, tuple(divmod(cell, width) for cell in path))
 
-                    if grid[new_pos[0]][new_pos[1]] == CellType.ROAD and new_pos not in visited:
-                        visited.add(new_pos)
-                        q.append(path + [new_pos])
-        
-        return deque()
+    def _follow(self, path: Route) -> None:
+        self.path, self.path_index, self._steps = path, 0, path.steps(self.carpark.width)
+        if not self.pathing_to_park:
+            self._reach = path.reach(self._fov_table)
 
-    def search_for_parking(self, visualize=False, delay=0.5) -> int:
+    def _skip_ahead(self) -> None:
+        """
+        Jump to the end of the path if no FOV along the rest of it covers a row of the level with a free
+        parking space, leaving the driver in the state ticking there would have without checking any FOV.
+        This is a single AND of the route's `reach` against the carpark's `free_row_masks`.
+        """
+        if self._reach[self.path_index] & self.carpark.free_row_masks[self.current_level]:
+            return
+        skipped = len(self._steps) - self.path_index
+        if skipped:
+            self.path_index += skipped
+            self.time += skipped
+            step = self._fov_row = self._steps[-1]
+            self.cell, self.heading = step >> 2, step & 3
+
+    def search_for_parking(self, visualize=False, delay=0.5, fast=False) -> int:
         """
         Search for a parking space in the carpark.
         This method will keep moving in the current direction until a parking space is found.
@@ -148,74 +167,120 @@ class DriverBase(ABC):
         Args:
             visualize: Whether to visualize the driver's actions in the carpark.
             delay: The delay in seconds between each tick of the driver's actions.
+            fast: Whether to skip ahead to the first free parking space in view instead of ticking
+                along every level, see `_fast_forward`. Ignored when visualizing or recording.
+                Stretches of the route with no free parking space in view are skipped either way
+                unless visualizing or recording, see `_skip_ahead`.
         
         Returns:
             The time taken to find a parking space.
         """
+        # the recorder is only checked here, so that ticks cost nothing extra when it is not attached
+        tick = self._tick
+        if self.recorder is not None:
+            tick = self._recorded_tick
+            self.recorder.record(self)
+
         if visualize:
-            self.display()
+            renderer = FrameRenderer()
+            try:
+                while not self.completed:
+                    renderer.draw(*self._frame())
+                    tick()
+                    sleep(delay)
+            finally:
+                # restore the cursor even if interrupted
+                renderer.close()
+        elif self.recorder is not None:
             while not self.completed:
-                # clear display
-                for _ in range(self.carpark.length + 3):
-                    sys.stdout.write("\x1b[1A\x1b[2K")
-                self.display()
-                self._tick()
-                sleep(delay)
+                tick()
         else:
+            if fast:
+                self._fast_forward()
             while not self.completed:
-                self._tick()
+                if not self.pathing_to_park:
+                    self._skip_ahead()
+                tick()
         
         return self.time
 
-    def _tick(self) -> None:
-        if not self.path:
-            if self.pos == (self.carpark.north_entrance[0] - 1, self.carpark.north_entrance[1]):
-                # go up a level
-                self.current_level += 1
-                self.pos = self.carpark.north_entrance
-                self.direction = (1, 0) # south
-                self.path = self._generate_path()
-            elif self.pos == (self.carpark.south_entrance[0] + 1, self.carpark.south_entrance[1]):
-                # go up a level
-                self.current_level += 1
-                self.pos = self.carpark.south_entrance
-                self.direction = (-1, 0) # north
-                self.path = self._generate_path()
-            elif self.pos == (self.carpark.north_ramp[0] - 1, self.carpark.north_ramp[1]):
-                # go down a level
-                self.current_level -= 1
-                self.pos = self.carpark.north_ramp
-                self.direction = (1, 0) # south
-                self.path = self._generate_path()
-            elif self.pos == (self.carpark.south_ramp[0] + 1, self.carpark.south_ramp[1]):
-                # go down a level
-                self.current_level -= 1
-                self.pos = self.carpark.south_ramp
-                self.direction = (-1, 0) # north
-                self.path = self._generate_path()
-            else:
-                # search complete
+    def _fast_forward(self) -> None:
+        """
+        Jump along the path of each level to the first step at which a free parking space is within the FOV,
+        leaving the driver in exactly the state ticking up to that step would have, pathing to the parking space.
+        The FOV of every remaining step of a path is checked at once in a single gather against the level.
+        """
+        table = self._fov_table
+        while not self.pathing_to_park:
+            # the rest of a path with no free parking space in view is skipped without a gather
+            self._skip_ahead()
+            steps = self.path.fov_rows(self.carpark.width)[self.path_index:]
+            if len(steps):
+                cells = table.padded[steps]
+                free = (self.carpark.flat_levels[self.current_level][cells] == _UNOCCUPIED) & (cells >= 0)
+                found = free.any(axis=1)
+                # skip to the step where a parking space is first seen, or the end of the path if there is none
+                skipped = int(found.argmax()) + 1 if found.any() else len(steps)
+                self.path_index += skipped
+                self.time += skipped
+                self.cell, self.heading = divmod(int(steps[skipped - 1]), 4)
+
+                if found.any():
+                    self.pathing_to_park = True
+                    self._follow(self._calculate_path_to_park(self._check_fov()))
+                    continue
+
+            if not self._change_level():
                 self.completed = True
                 return
+
+    def _change_level(self) -> bool:
+        """
+        Take the ramp at the driver's position, if there is one, and generate the path for the new level.
+        
+        Returns:
+            True if the driver changed level, False if it is not at a ramp.
+        """
+        ramp = self._ramps.get(self.cell)
+        if ramp is None:
+            return False
+
+        change, self.pos, self.direction = ramp
+        self.current_level += change
+        self._follow(self._generate_path())
+        return True
+
+    def _tick(self) -> None:
+        if self.path_index == len(self._steps) and not self._change_level():
+            # search complete
+            self.completed = True
+            return
             
-        # continue along path
-        next_pos = self.path.popleft()
-        self.direction = (next_pos[0] - self.pos[0], next_pos[1] - self.pos[1])
-        self.pos = next_pos
+        # continue along path, each step being 4 * cell + heading
+        step = self._steps[self.path_index]
+        self.path_index += 1
+        self.cell, self.heading = step >> 2, step & 3
+        self._fov_row = step
         
         # check for parking spaces within FOV
-        parking_space = self._check_fov()
         if not self.pathing_to_park:
-            if parking_space:
-                self.path = self._calculate_path_to_park(parking_space)
+            parking_space = self._find_parking()
+            if parking_space >= 0:
                 self.pathing_to_park = True
+                self._follow(self._calculate_path_to_park(divmod(parking_space, self.carpark.width)))
         
         self.time += 1
 
+    def _recorded_tick(self) -> None:
+        self._tick()
+        if not self.completed:
+            self.recorder.record(self)
+
     @abstractmethod
-    def _generate_path(self) -> None:
+    def _generate_path(self) -> Route:
         """
         Generate a path for the current floor.
+        The returned route may be shared between drivers, so it is followed with `path_index` rather than consumed.
         """
         pass
 
@@ -224,33 +289,39 @@ class DriverBase(ABC):
         Reset the driver to the initial state.
         """
         self.current_level = 0
-        self.pos = self.carpark.south_entrance
-        self.direction = (-1, 0)
-        self.fov = []
+        self.pos, self.direction = self.carpark.entrances[self.entrance]
+        self._fov_row = -1
         self.time = 0
         self.pathing_to_park = False
         self.completed = False
-        self.path = self._generate_path()
+        self._follow(self._generate_path())
+        if self.recorder is not None:
+            self.recorder.clear()
+
+    def _frame(self) -> Tuple[List[List[str]], str]:
+        """
+        The symbol of every cell of the current level, with the driver, its FOV and its path highlighted,
+        and the status line below.
+        """
+        return self._draw_frame(
+            self.carpark.grid[self.current_level], self.pos, self.fov, self.path[self.path_index:], self.time, self.current_level
+        )
+
+    @classmethod
+    def _draw_frame(
+        cls, level: np.ndarray, pos: Tuple[int, int], fov: Iterable[int], path: Iterable[Tuple[int, int]], time: int, current_level: int
+    ) -> Tuple[List[List[str]], str]:
+        grid = level.tolist()
+        m = len(grid[0])
+        cells = [[cls._display_map_colored[value] for value in row] for row in grid]
+        for i, j in path:
+            cells[i][j] = Style.colorize(cls._display_map_uncolored[grid[i][j]], "blue")
+        for i, j in (divmod(cell, m) for cell in fov):
+            if grid[i][j] == CellType.OCCUPIED.value or grid[i][j] == _UNOCCUPIED:
+                cells[i][j] = Style.colorize(cls._display_map_uncolored[grid[i][j]], "yellow")
+        i, j = pos
+        cells[i][j] = cls._cur_pos_symbol
+        return cells, f"t = {time}{" "*(m*3-(3+len(str(time))))}L{current_level}"
 
     def display(self) -> None:
-        path, fov = set(self.path), set(self.fov)
-        grid = self.carpark.levels[self.current_level]
-        n, m = len(grid), len(grid[0])
-        print(f"┌{"─"*m*3}─┐")
-        for i in range(n):
-            s = "│"
-            for j in range(m):
-                s += " "
-                if (i, j) == self.pos:
-                    s += self._cur_pos_symbol
-                elif (i, j) in fov and (grid[i][j] == CellType.OCCUPIED or grid[i][j] == CellType.UNOCCUPIED):
-                    s += Style.colorize(self._display_map_uncolored[grid[i][j].value], "yellow")
-                elif (i, j) in path:
-                    s += Style.colorize(self._display_map_uncolored[grid[i][j].value], "blue")
-                else:
-                    s += self._display_map_colored[grid[i][j].value]
-                s += " "
-            s += " │"
-            print(s)
-        print(f"└{"─"*m*3}─┘")
-        print(f"t = {self.time}{" "*(m*3-(3+len(str(self.time))))}L{self.current_level}")
\ No newline at end of file
+        sys.stdout.write(FrameRenderer.format(*self._frame()))
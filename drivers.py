@@ -1,104 +1,143 @@
 from driver_base import DriverBase
 from parking import CellType
+from geometry import Route
 from collections import deque
+from functools import lru_cache
+from typing import Tuple
+
+def _check_single_block(driver_class: type, carpark) -> None:
+    # the hand-written routes are laid out for the ramps of a single block, and would drive through void elsewhere
+    if not carpark.single_block:
+        raise ValueError(
+            f"{driver_class.__name__} only searches single block carparks, use a strategy from `strategies` for other layouts"
+        )
 
 class BottomUpDriver(DriverBase):
     """
     A driver that starts searching from the bottom up.
     """
+    __slots__ = ()
     
-    def __init__(self, carpark):
-        super().__init__(carpark)
+    def __init__(self, carpark, entrance=0):
+        _check_single_block(type(self), carpark)
+        super().__init__(carpark, entrance)
 
     def _generate_path(self):
+        return self._cached_path(
+            self.carpark.length, self.carpark.width, len(self.carpark.grid),
+            self.current_level, self.pos, self.direction, self.carpark.north_entrance
+        )
+
+    @staticmethod
+    @lru_cache(maxsize=None)
+    def _cached_path(
+        n: int, m: int, levels: int, current_level: int,
+        pos: Tuple[int, int], direction: Tuple[int, int], north_entrance: Tuple[int, int]
+    ) -> Route:
+        """
+        Build the path for a level, which only depends on the carpark geometry and where the driver enters the level.
+        """
         path = deque()
-        reverse = self.pos == self.carpark.north_entrance
-        grid = self.carpark.levels[self.current_level]
-        _, m = len(grid), len(grid[0])
+        reverse = pos == north_entrance
         
-        for i in range(self.pos[0] + self.direction[0], len(grid) - 2 if self.direction[0] > 0 else 1, 3 * self.direction[0]):
+        for i in range(pos[0] + direction[0], n - 2 if direction[0] > 0 else 1, 3 * direction[0]):
             if not reverse:
                 path.extend([(i, j) for j in range(1, m - 1)])
-                path.extend([(k, m - 2) for k in range(i + 1 * self.direction[0], i + 3 * self.direction[0], self.direction[0])])
+                path.extend([(k, m - 2) for k in range(i + 1 * direction[0], i + 3 * direction[0], direction[0])])
             else:
                 path.extend([(i, j) for j in range(m - 2, 0, -1)])
-                path.extend([(k, 1) for k in range(i + 1 * self.direction[0], i + 3 * self.direction[0], self.direction[0])])
+                path.extend([(k, 1) for k in range(i + 1 * direction[0], i + 3 * direction[0], direction[0])])
 
             reverse = not reverse
 
         path.pop()
-        if self.current_level != len(self.carpark.levels) - 1:
-            if reverse != (self.pos == self.carpark.north_entrance):
+        if current_level != levels - 1:
+            if reverse != (pos == north_entrance):
                 path.pop()
                 if not reverse:
                     path.extend([(path[-1][0], j) for j in range(2, m - 1)])
                 else:
                     path.extend([(path[-1][0], j) for j in range(m - 3, 0, -1)])
                 reverse = not reverse
-                path.append((path[-1][0] + 1 * self.direction[0], path[-1][1]))
+                path.append((path[-1][0] + 1 * direction[0], path[-1][1]))
             
             if not reverse:
-                path.extend([(path[-1][0] + 1 * self.direction[0], j) for j in range(1, m - 1)])
+                path.extend([(path[-1][0] + 1 * direction[0], j) for j in range(1, m - 1)])
             else:
-                path.extend([(path[-1][0] + 1 * self.direction[0], j) for j in range(m - 2, 0, -1)])
+                path.extend([(path[-1][0] + 1 * direction[0], j) for j in range(m - 2, 0, -1)])
         else:
             path.pop()
             
-        return path
+        return Route(pos, tuple(path))
     
 
 class TopDownDriver(DriverBase):
     """
     A driver that tries to reach the top as quickly as possible, then searches downwards.
     """
+    __slots__ = ("top_reached",)
     
-    def __init__(self, carpark):
+    def __init__(self, carpark, entrance=0):
+        _check_single_block(type(self), carpark)
         self.top_reached = False
-        super().__init__(carpark)
+        super().__init__(carpark, entrance)
 
     def _generate_path(self):
         if self.current_level == len(self.carpark.levels) - 1:
             self.top_reached = True
 
+        return self._cached_path(
+            self.carpark.length, self.carpark.width, len(self.carpark.grid),
+            self.current_level, self.pos, self.direction, self.carpark.south_ramp, self.top_reached
+        )
+
+    @staticmethod
+    @lru_cache(maxsize=None)
+    def _cached_path(
+        n: int, m: int, levels: int, current_level: int,
+        pos: Tuple[int, int], direction: Tuple[int, int], south_ramp: Tuple[int, int], top_reached: bool
+    ) -> Route:
+        """
+        Build the path for a level, which only depends on the carpark geometry, where the driver enters the level
+        and whether the top level has been reached.
+        """
         path = deque()
-        grid = self.carpark.levels[self.current_level]
-        _, m = len(grid), len(grid[0])
 
-        if not self.top_reached:
-            path.extend([(self.pos[0] + self.direction[0], j) for j in range(1, m - 1)])
-            path.append((self.pos[0], m - 2))
-            path.extend([(self.pos[0] - self.direction[0], j) for j in range(m - 2, 0, -1)])
+        if not top_reached:
+            path.extend([(pos[0] + direction[0], j) for j in range(1, m - 1)])
+            path.append((pos[0], m - 2))
+            path.extend([(pos[0] - direction[0], j) for j in range(m - 2, 0, -1)])
         else:
-            reverse = self.pos == self.carpark.south_ramp
-            for i in range(self.pos[0] + self.direction[0], len(grid) - 2 if self.direction[0] > 0 else 1, 3 * self.direction[0]):
+            reverse = pos == south_ramp
+            for i in range(pos[0] + direction[0], n - 2 if direction[0] > 0 else 1, 3 * direction[0]):
                 if not reverse:
                     path.extend([(i, j) for j in range(1, m - 1)])
-                    path.extend([(k, m - 2) for k in range(i + 1 * self.direction[0], i + 3 * self.direction[0], self.direction[0])])
+                    path.extend([(k, m - 2) for k in range(i + 1 * direction[0], i + 3 * direction[0], direction[0])])
                 else:
                     path.extend([(i, j) for j in range(m - 2, 0, -1)])
-                    path.extend([(k, 1) for k in range(i + 1 * self.direction[0], i + 3 * self.direction[0], self.direction[0])])
+                    path.extend([(k, 1) for k in range(i + 1 * direction[0], i + 3 * direction[0], direction[0])])
 
                 reverse = not reverse
 
             path.pop()
-            if self.current_level != 0:
-                if (reverse == (self.pos == self.carpark.south_ramp)) == (self.current_level == len(self.carpark.levels) - 1):
+            if current_level != 0:
+                if (reverse == (pos == south_ramp)) == (current_level == levels - 1):
                     path.pop()
                     if not reverse:
                         path.extend([(path[-1][0], j) for j in range(2, m - 1)])
                     else:
                         path.extend([(path[-1][0], j) for j in range(m - 3, 0, -1)])
                     reverse = not reverse
-                    path.append((path[-1][0] + 1 * self.direction[0], path[-1][1]))
+                    path.append((path[-1][0] + 1 * direction[0], path[-1][1]))
                 
                 if not reverse:
-                    path.extend([(path[-1][0] + 1 * self.direction[0], j) for j in range(1, m - 1)])
+                    path.extend([(path[-1][0] + 1 * direction[0], j) for j in range(1, m - 1)])
                 else:
-                    path.extend([(path[-1][0] + 1 * self.direction[0], j) for j in range(m - 2, 0, -1)])
+                    path.extend([(path[-1][0] + 1 * direction[0], j) for j in range(m - 2, 0, -1)])
             else:
                 path.pop()
         
-        return path
+        return Route(pos, tuple(path))
     
     def reset(self):
         self.top_reached = False
@@ -0,0 +1,212 @@
+"""
+Lookup tables that only depend on the dimensions of a carpark level.
+They are built once per geometry and shared by every driver.
+"""
+from collections import OrderedDict, deque
+from functools import lru_cache
+import numpy as np
+from typing import List, Tuple
+
+DIRECTIONS = (
+    (-1, 0),  # north
+    (0, 1),  # east
+    (1, 0),  # south
+    (0, -1),  # west
+)
+
+def _fov_offsets(direction: int) -> np.ndarray:
+    """
+    The (row, column) offsets of the field of view (FOV) of a driver facing `DIRECTIONS[direction]`,
+    in the order they are checked: the 1 cell wide ring around the driver, then the cone in front of it.
+    """
+    offsets = [(dy, dx) for dy in range(-1, 2) for dx in range(-1, 2) if (dy, dx) != (0, 0)]
+    (fy, fx), (ly, lx), (ry, rx) = DIRECTIONS[direction], DIRECTIONS[(direction - 1) % 4], DIRECTIONS[(direction + 1) % 4]
+    for k in range(2, 4):
+        offsets.append((k * fy, k * fx))
+        for s in range(1, k + 1):
+            offsets.append((k * fy + s * ly, k * fx + s * lx))
+            offsets.append((k * fy + s * ry, k * fx + s * rx))
+    return np.array(offsets)
+
+class FieldOfView:
+    """
+    The cells within the FOV of a driver for every position and heading on a level of the given dimensions,
+    as flat indices (row * width + column) into the level.
+    The FOV of a driver at flat position `p` facing `DIRECTIONS[d]` is `cells[offsets[4 * p + d]:offsets[4 * p + d + 1]]`,
+    which is also `rows[4 * p + d]` and row `4 * p + d` of `padded`, where cells out of bounds are -1.
+    """
+    def __init__(self, length: int, width: int) -> None:
+        self.length = length
+        self.width = width
+        rows, cols = np.divmod(np.arange(length * width), width)
+        self.padded = np.empty((length * width, 4, len(_fov_offsets(0))), dtype=np.int32)
+        for d in range(4):
+            offsets = _fov_offsets(d)
+            i = rows[:, np.newaxis] + offsets[:, 0]
+            j = cols[:, np.newaxis] + offsets[:, 1]
+            self.padded[:, d] = np.where((0 <= i) & (i < length) & (0 <= j) & (j < width), i * width + j, -1)
+        self.padded = self.padded.reshape(length * width * 4, -1)
+
+        # pack the rows without the out of bounds cells
+        valid = self.padded >= 0
+        self.cells = self.padded[valid]
+        self.offsets = np.zeros(len(self.padded) + 1, dtype=np.int64)
+        np.cumsum(valid.sum(axis=1), out=self.offsets[1:])
+        # and as tuples of ints, for checking one FOV at a time without NumPy overhead,
+        # sharing one int object per cell so that large levels do not hold an object per entry
+        interned, cells = list(range(length * width)), []
+        for start in range(0, len(self.cells), 1 << 16):
+            cells.extend(map(interned.__getitem__, self.cells[start:start + (1 << 16)].tolist()))
+        self.rows = [tuple(cells[start:stop]) for start, stop in zip(self.offsets[:-1].tolist(), self.offsets[1:].tolist())]
+        # the bitmask of the level rows each FOV covers, bit `i` being row `i`,
+        # built from the few rows next to the driver's that a FOV can reach
+        rows = np.where(valid, self.padded // width, length)
+        top = rows.min(axis=1)
+        near = np.zeros(len(rows), dtype=np.int64)
+        for row, inside in zip(rows.T, valid.T):
+            near[inside] |= np.int64(1) << (row[inside] - top[inside]).astype(np.int64)
+        self.row_masks = [mask << shift for mask, shift in zip(near.tolist(), top.tolist())]
+
+@lru_cache
+def field_of_view(length: int, width: int) -> FieldOfView:
+    return FieldOfView(length, width)
+
+class Route:
+    """
+    An immutable path of (row, column) cells driven from `start`.
+    Routes are cached and shared between drivers, which each keep their own position along them.
+    """
+    __slots__ = ("start", "cells", "_fov_rows", "_steps", "_reach")
+
+    def __init__(self, start: Tuple[int, int], cells: Tuple[Tuple[int, int], ...]) -> None:
+        self.start = start
+        self.cells = cells
+        self._fov_rows = None
+        self._steps = None
+        self._reach = None
+
+    def __len__(self) -> int:
+        return len(self.cells)
+
+    def __getitem__(self, index):
+        return self.cells[index]
+
+    def __iter__(self):
+        return iter(self.cells)
+
+    def fov_rows(self, width: int) -> np.ndarray:
+        """
+        The row of the `FieldOfView` table for each step of the route, i.e. the cell stepped onto
+        and the direction of the step, computed once per route.
+        """
+        if self._fov_rows is None:
+            positions = np.array((self.start,) + self.cells, dtype=np.int64).reshape(-1, 2)
+            dy, dx = np.diff(positions, axis=0).T
+            headings = np.full(9, -1)
+            headings[[3 * (y + 1) + x + 1 for y, x in DIRECTIONS]] = range(4)
+            self._fov_rows = 4 * (positions[1:, 0] * width + positions[1:, 1]) + headings[3 * (dy + 1) + dx + 1]
+        return self._fov_rows
+
+    def steps(self, width: int) -> List[int]:
+        """
+        `fov_rows` as a list of ints, i.e. `4 * cell + heading` for each step, for stepping through one at a time.
+        """
+        if self._steps is None:
+            self._steps = self.fov_rows(width).tolist()
+        return self._steps
+
+    def reach(self, table: FieldOfView) -> List[int]:
+        """
+        The bitmask of the level rows covered by the FOV of any step from each step of the route on,
+        with a final 0 for the end of the route, computed once per route.
+        """
+        if self._reach is None:
+            reach = [0] * (len(self.cells) + 1)
+            for i, step in zip(range(len(self.cells) - 1, -1, -1), reversed(self.steps(table.width))):
+                reach[i] = reach[i + 1] | table.row_masks[step]
+            self._reach = reach
+        return self._reach
+
+class RoadNetwork:
+    """
+    Shortest paths along the ROAD cells of a level, which never change between samples.
+    Every search from a source cell is done once and its BFS parent table kept, so that the path
+    from that source to any cell next to the road can be reconstructed in O(path length).
+    The tables of the least recently used sources are dropped beyond `max_cells` table entries,
+    which on small levels is never, and on large ones bounds the memory they take.
+    Cells are flat indices (row * width + column) into the level.
+    """
+    def __init__(self, length: int, width: int, road: bytes, max_cells: int = 1 << 24) -> None:
+        self.length = length
+        self.width = width
+        self._road = road
+        self._parents = OrderedDict()
+        self._distances = {}
+        self._max_sources = max(1, max_cells // (length * width))
+
+    def _search(self, source: int) -> None:
+        """
+        Breadth-first search from `source` through ROAD cells, visiting neighbours in the order of `DIRECTIONS`.
+        Cells that are not ROAD are reached but not expanded, so each keeps the first cell that reached it.
+        """
+        parents = [-1] * (self.length * self.width)
+        distances = [-1] * (self.length * self.width)
+        parents[source], distances[source] = source, 0
+        queue = deque([source])
+        while queue:
+            current = queue.popleft()
+            i, j = divmod(current, self.width)
+            for dy, dx in DIRECTIONS:
+                y, x = i + dy, j + dx
+                if 0 <= y < self.length and 0 <= x < self.width:
+                    cell = y * self.width + x
+                    if parents[cell] < 0:
+                        parents[cell], distances[cell] = current, distances[current] + 1
+                        if self._road[cell]:
+                            queue.append(cell)
+
+        self._parents[source] = np.array(parents, dtype=np.int32)
+        self._distances[source] = np.array(distances, dtype=np.int32)
+        if len(self._parents) > self._max_sources:
+            dropped, _ = self._parents.popitem(last=False)
+            del self._distances[dropped]
+
+    def _lookup(self, source: int) -> None:
+        if source in self._parents:
+            self._parents.move_to_end(source)
+        else:
+            self._search(source)
+
+    def distances(self, source: int) -> np.ndarray:
+        """
+        The number of steps from `source` to every cell, or -1 for cells that cannot be reached.
+        """
+        self._lookup(source)
+        return self._distances[source]
+
+    def path(self, source: int, target: int) -> List[int]:
+        """
+        The cells stepped through from `source` to `target`, excluding `source`.
+        
+        Returns:
+            A list of flat cell indices ending with `target`, or an empty list if it cannot be reached.
+        """
+        self._lookup(source)
+        parents = self._parents[source]
+        if parents[target] < 0:
+            return []
+
+        path = []
+        while target != source:
+            path.append(target)
+            target = int(parents[target])
+        path.reverse()
+        return path
+
+@lru_cache
+def road_network(length: int, width: int, road: bytes) -> RoadNetwork:
+    """
+    The `RoadNetwork` of a level with the given dimensions, where `road` holds one byte per cell that is
+    non-zero for ROAD cells. Levels with the same road layout share a network.
+    """
+    return RoadNetwork(length, width, road)
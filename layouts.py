@@ -0,0 +1,151 @@
+"""
+Carpark geometries: a generator of parametrised layouts and their compact, run-length encoded storage.
+"""
+from enum import Enum
+import numpy as np
+from typing import Dict, List, Tuple
+
+class CellType(Enum):
+    ROAD = 0
+    RAMP = 1
+    UNOCCUPIED = 2
+    OCCUPIED = 3
+    VOID = 4
+
+Position = Tuple[int, int]
+# the cell at the end of a ramp as a flat index (row * width + column) -> (level change, arrival position, arrival direction)
+Transitions = Dict[int, Tuple[int, Position, Position]]
+
+class Layout:
+    """
+    The static geometry of a carpark: the `CellType` of every cell with every parking space OCCUPIED,
+    the ramps between levels and the street entrances of the bottom level.
+    The cells are kept run-length encoded in C order, since a level is mostly long runs of road, parking and void,
+    so a layout is small to keep, save and send to worker processes however large the carpark, and is only
+    expanded to the dense grid the simulation works on by `grid`.
+    """
+    def __init__(
+        self, shape: Tuple[int, int, int], values: np.ndarray, lengths: np.ndarray,
+        transitions: Transitions, entrances: List[Tuple[Position, Position]]
+    ) -> None:
+        self.shape = shape
+        self.values = values
+        self.lengths = lengths
+        self.transitions = transitions
+        self.entrances = entrances
+
+    @classmethod
+    def from_grid(cls, grid: np.ndarray, transitions: Transitions, entrances: List[Tuple[Position, Position]]) -> "Layout":
+        flat = grid.reshape(-1)
+        starts = np.flatnonzero(np.diff(flat, prepend=np.int16(-1)))
+        lengths = np.diff(np.append(starts, len(flat)))
+        return cls(grid.shape, flat[starts].astype(np.uint8), lengths.astype(np.int32), transitions, entrances)
+
+    def grid(self) -> np.ndarray:
+        """
+        The dense (levels, length, width) array of `CellType` values.
+        """
+        return np.repeat(self.values, self.lengths).reshape(self.shape)
+
+    @property
+    def nbytes(self) -> int:
+        return self.values.nbytes + self.lengths.nbytes
+
+    def save(self, path: str) -> None:
+        transitions = np.array(
+            [(trigger, change, *arrival, *direction) for trigger, (change, arrival, direction) in self.transitions.items()],
+            dtype=np.int64
+        ).reshape(-1, 6)
+        entrances = np.array([(*position, *direction) for position, direction in self.entrances], dtype=np.int64).reshape(-1, 4)
+        np.savez_compressed(
+            path, shape=np.array(self.shape), values=self.values, lengths=self.lengths,
+            transitions=transitions, entrances=entrances
+        )
+
+    @classmethod
+    def load(cls, path: str) -> "Layout":
+        with np.load(path) as data:
+            transitions = {
+                trigger: (change, (i, j), (dy, dx)) for trigger, change, i, j, dy, dx in data["transitions"].tolist()
+            }
+            entrances = [((i, j), (dy, dx)) for i, j, dy, dx in data["entrances"].tolist()]
+            return cls(tuple(data["shape"].tolist()), data["values"], data["lengths"], transitions, entrances)
+
+def block_transitions(length: int, width: int, west: int, east: int) -> Transitions:
+    """
+    The ramps of a block whose road columns are `west` and `east`, on levels of the given dimensions.
+    """
+    north_entrance, south_entrance = (1, east), (length - 2, west)
+    north_ramp, south_ramp = (1, west), (length - 2, east)
+    return {
+        (north_entrance[0] - 1) * width + north_entrance[1]: (1, north_entrance, (1, 0)),  # go up a level, south
+        (south_entrance[0] + 1) * width + south_entrance[1]: (1, south_entrance, (-1, 0)),  # go up a level, north
+        (north_ramp[0] - 1) * width + north_ramp[1]: (-1, north_ramp, (1, 0)),  # go down a level, south
+        (south_ramp[0] + 1) * width + south_ramp[1]: (-1, south_ramp, (-1, 0)),  # go down a level, north
+    }
+
+def generate_layout(
+    levels: int = 6,
+    rows: int = 10,
+    cols: int = 20,
+    blocks: int = 1,
+    entrances: int = 1,
+    footprint: np.ndarray | None = None,
+    pillars: float = 0.0,
+    seed: int = 0
+) -> Layout:
+    """
+    Generate the layout of a carpark of one or more blocks side by side.
+    Every block is `cols` parking spaces wide between two road columns, with ramp rows at its north and south ends
+    and 3-row aisles (road, parking, parking) in between, and has its own ramps up and down at both ends.
+    The aisles run through all the blocks, and the ramps of the top level are parking spaces.
+    A single block with the defaults is the original carpark.
+
+    Args:
+        levels: The number of levels.
+        rows: The number of parking rows between the ramp rows, in pairs.
+        cols: The number of parking spaces along an aisle in each block.
+        blocks: The number of blocks, each with 2 ramps up and 2 ramps down.
+        entrances: The number of blocks, from the west, whose south end is a street entrance to the bottom level.
+        footprint: A boolean (length, width) mask of the cells within the structure on every level, the parking spaces
+            outside it being void. Road and ramps are always kept, so that the whole carpark stays reachable.
+        pillars: The fraction of parking spaces that are void on every level, picked at random.
+        seed: The seed of the pillars.
+
+    Returns:
+        The layout of the carpark.
+    """
+    if not 1 <= entrances <= blocks:
+        raise ValueError(f"a carpark of {blocks} blocks can have 1 to {blocks} entrances, not {entrances}")
+
+    length, block_width = 3 * (rows // 2) + 2, cols + 2
+    width = blocks * block_width
+    level = np.full((length, width), CellType.OCCUPIED.value, dtype=np.uint8)
+    level[2:-2:3, 1:-1] = CellType.ROAD.value
+
+    transitions, street, ramps = {}, [], []
+    for block in range(blocks):
+        west, east = block * block_width + 1, (block + 1) * block_width - 2
+        level[[0, -1], west - 1:east + 2] = CellType.RAMP.value
+        level[[0, 0, -1, -1], [west - 1, east + 1, west - 1, east + 1]] = CellType.VOID.value
+        level[1:-1, [west, east]] = CellType.ROAD.value
+        level[1, west] = level[-2, east] = CellType.RAMP.value
+
+        transitions.update(block_transitions(length, width, west, east))
+        ramps.extend([(1, west), (length - 2, east)])
+        if block < entrances:
+            street.append(((length - 2, west), (-1, 0)))
+
+    parking = level == CellType.OCCUPIED.value
+    void = np.zeros_like(parking)
+    if footprint is not None:
+        void |= ~np.asarray(footprint, dtype=bool)
+    if pillars:
+        void |= np.random.default_rng(seed).random(level.shape) < pillars
+    level[parking & void] = CellType.VOID.value
+
+    carpark = np.repeat(level[np.newaxis], levels, axis=0)
+    for ramp in ramps:
+        carpark[-1][ramp] = CellType.OCCUPIED.value
+
+    return Layout.from_grid(carpark, transitions, street)
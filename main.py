@@ -1,51 +1,125 @@
-from parking import MultiLevelCarPark
-from drivers import BottomUpDriver, TopDownDriver
-import numpy as np
-import sys
+from sweep import run_paired, run_sweep, sweep_config
+from stats import StreamingStats
+from store import ResultStore
+from profiling import Profile
+import argparse
+
+def summarize(stats: StreamingStats) -> str:
+    # mean, median, stdev, min and max
+    return f"Mean: {stats.mean:.2f}, Median: {stats.median:.2f}, Stdev: {stats.stdev:.2f}, Min: {stats.min:.2f}, Max: {stats.max:.2f}"
+
+def summarize_difference(stats: StreamingStats) -> str:
+    # mean and 95% confidence interval of the paired differences
+    lo, hi = stats.confidence_interval()
+    return f"Mean: {stats.mean:.2f}, 95% CI: [{lo:.2f}, {hi:.2f}], Samples: {stats.count}"
+
+def report_profile(profile: Profile | None, path: str | None) -> None:
+    # print the profile, or export it if a path is given
+    if profile is None:
+        return
+    if path is not None:
+        profile.save(path)
+        print(f"\nProfile saved to {path}")
+    else:
+        print(f"\nProfile:\n{profile.report()}")
 
 def main() -> None:
-    # Initialize the carpark and drivers
-    carpark = MultiLevelCarPark(levels=6, rows=10, cols=20)
-    bottom_up_driver = BottomUpDriver(carpark)
-    top_down_driver = TopDownDriver(carpark)
-    sample_size = 1001
+    parser = argparse.ArgumentParser(description="Compare bottom-up and top-down parking search strategies.")
+    parser.add_argument("capacities", nargs="*", help="capacities of the carpark to sample, e.g. 0.8 0.95")
+    parser.add_argument(
+        "--samples", type=int, default=None,
+        help="number of samples per capacity (default: 1001), or the most to take with --paired (default: 100000)"
+    )
+    parser.add_argument("--workers", type=int, default=None, help="number of worker processes (default: number of CPUs)")
+    parser.add_argument("--store", default=None, help="directory to keep the search times in, resuming the sweep stored there")
+    parser.add_argument(
+        "--aggregate", action="store_true",
+        help="summarize the search times in --store without simulating, for the given capacities or all stored"
+    )
+    parser.add_argument(
+        "--paired", action="store_true",
+        help="sample each capacity until the 95%% confidence interval of the mean per-layout difference between the drivers is --ci-width wide"
+    )
+    parser.add_argument("--ci-width", type=float, default=5.0, help="confidence interval width to stop at with --paired (default: 5.0)")
+    parser.add_argument("--levels", type=int, default=6, help="number of levels of the carpark (default: 6)")
+    parser.add_argument("--rows", type=int, default=10, help="number of parking rows per level (default: 10)")
+    parser.add_argument("--cols", type=int, default=20, help="number of parking spaces per row (default: 20)")
+    parser.add_argument(
+        "--profile", action="store_true",
+        help="time the phases of every search and report them after the results, simulating one search at a time (much slower)"
+    )
+    parser.add_argument("--profile-json", default=None, help="file to export the profile to as JSON, implies --profile")
+    args = parser.parse_args()
+    sample_size = args.samples or (100_000 if args.paired else 1001)
 
     try:
-        capacities = list(map(float, sys.argv[1:]))
+        capacities = list(map(float, args.capacities))
     except ValueError:
         print("Invalid input. Please provide capacities as floating point numbers.")
         return
 
-    for i, capacity in enumerate(capacities):
+    store = None
+    if args.store is not None:
+        try:
+            # aggregating reads the store as it was configured
+            config = None if args.aggregate else sweep_config(levels=args.levels, rows=args.rows, cols=args.cols, sample_size=sample_size)
+            store = ResultStore(args.store, config)
+        except ValueError as e:
+            print(f"Invalid store. {e}")
+            return
+    elif args.aggregate:
+        print("Invalid input. --aggregate needs a --store to read from.")
+        return
+
+    profile = None
+    if args.profile or args.profile_json is not None:
+        if args.aggregate:
+            print("Invalid input. --aggregate does not simulate, so there is nothing to profile.")
+            return
+        profile = Profile()
+
+    if args.paired:
+        if store is not None:
+            print("Invalid input. --paired stops sampling adaptively and does not use --store.")
+            return
+        # Sample the drivers on the same carpark layouts until their mean difference is known to within the CI width
+        paired = run_paired(
+            capacities, args.ci_width, max_samples=sample_size, levels=args.levels, rows=args.rows, cols=args.cols,
+            workers=args.workers, profile=profile
+        )
+        for capacity, ((bottom_up_stats, top_down_stats), (difference,)) in zip(capacities, paired):
+            print(f"\nCapacity: {int(capacity * 100)}%")
+            print(f"Bottom Up Driver - {summarize(bottom_up_stats)}")
+            print(f"Top Down Driver - {summarize(top_down_stats)}")
+            print(f"Top Down - Bottom Up - {summarize_difference(difference)}")
+        report_profile(profile, args.profile_json)
+        return
+
+    if args.aggregate:
+        capacities = capacities or store.capacities()
+        sweep = store.aggregate(capacities)
+    else:
+        # Simulate the drivers on the same carpark layouts, one per seed
+        sweep = run_sweep(
+            capacities, sample_size, store=store, levels=args.levels, rows=args.rows, cols=args.cols, workers=args.workers, profile=profile
+        )
+    for capacity, (bottom_up_stats, top_down_stats) in zip(capacities, sweep):
         print(f"\nCapacity: {int(capacity * 100)}%")
-        bottom_up_times, top_down_times = [], []
-        for k in range(sample_size):
-            # Set the capacity of the carpark
-            carpark.set_capacity(capacity, seed=k + (i * sample_size))
-            # Simulate the drivers moving through the carpark
-            bottom_up_times.append(bottom_up_driver.search_for_parking())
-            top_down_times.append(top_down_driver.search_for_parking())
-            # Reset the drivers for the next iteration
-            bottom_up_driver.reset()
-            top_down_driver.reset()
-        
-        # calculate mean, median, stdev, min and max
-        mean = np.mean(bottom_up_times)
-        median = np.median(bottom_up_times)
-        stdev = np.std(bottom_up_times)
-        print(f"Bottom Up Driver - Mean: {mean:.2f}, Median: {median:.2f}, Stdev: {stdev:.2f}, Min: {min(bottom_up_times):.2f}, Max: {max(bottom_up_times):.2f}")
-        
-        mean = np.mean(top_down_times)
-        median = np.median(top_down_times)
-        stdev = np.std(top_down_times)
-        print(f"Top Down Driver - Mean: {mean:.2f}, Median: {median:.2f}, Stdev: {stdev:.2f}, Min: {min(top_down_times):.2f}, Max: {max(top_down_times):.2f}")
+        if not bottom_up_stats.count:
+            print("No samples stored.")
+            continue
+        print(f"Bottom Up Driver - {summarize(bottom_up_stats)}")
+        print(f"Top Down Driver - {summarize(top_down_stats)}")
+    report_profile(profile, args.profile_json)
 
 if __name__ == "__main__":
     main()
     # visualization
+    # from parking import MultiLevelCarPark
+    # from drivers import BottomUpDriver, TopDownDriver
     # carpark = MultiLevelCarPark(levels=6, rows=10, cols=20)
     # carpark.set_capacity(0.95, seed=3)
     # bottom_up_driver = BottomUpDriver(carpark)
     # bottom_up_driver.search_for_parking(visualize=True, delay=0.1)
     # # top_down_driver = TopDownDriver(carpark)
-    # # top_down_driver.search_for_parking(visualize=True, delay=0.3)
\ No newline at end of file
+    # # top_down_driver.search_for_parking(visualize=True, delay=0.3)
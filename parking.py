@@ -1,88 +1,248 @@
-from enum import Enum
-from numpy import random
-from typing import List
+from layouts import CellType, Layout, block_transitions, generate_layout
+import math
+import numpy as np
+from typing import Tuple
 
-class CellType(Enum):
-    ROAD = 0
-    RAMP = 1
-    UNOCCUPIED = 2
-    OCCUPIED = 3
-    VOID = 4
+_CELL_TYPES = tuple(CellType)
+_UNOCCUPIED = CellType.UNOCCUPIED.value
+
+class GridView:
+    """
+    A read/write view over (part of) the occupancy grid that exposes cells as `CellType` members,
+    so that `levels[k][i][j]` behaves like the nested lists the carpark used to be stored as.
+    A view of a carpark's grid writes through the carpark, so that its index of free parking spaces stays up to date.
+    """
+    __slots__ = ("_grid", "_carpark", "_cells")
+
+    def __init__(self, grid: np.ndarray, carpark: "MultiLevelCarPark | None" = None, cells: np.ndarray | None = None) -> None:
+        """
+        Args:
+            grid: The cells viewed.
+            carpark: The carpark whose `grid` is viewed, if any.
+            cells: The flat index into the carpark's `grid` of every cell viewed, by default all of them in order.
+        """
+        self._grid = grid
+        self._carpark = carpark
+        self._cells = cells
+
+    def _indices(self) -> np.ndarray:
+        if self._cells is None:
+            self._cells = np.arange(self._grid.size).reshape(self._grid.shape)
+        return self._cells
+
+    def __len__(self) -> int:
+        return len(self._grid)
+
+    def __getitem__(self, index):
+        value = self._grid[index]
+        if isinstance(value, np.ndarray):
+            return GridView(value, self._carpark, None if self._carpark is None else self._indices()[index])
+        return _CELL_TYPES[value]
+
+    def __setitem__(self, index, cell: CellType) -> None:
+        if self._carpark is None:
+            self._grid[index] = cell.value
+        else:
+            self._carpark._write(np.ravel(self._indices()[index]), cell.value)
+
+    def __iter__(self):
+        if self._grid.ndim > 1:
+            return (self[k] for k in range(len(self._grid)))
+        return (_CELL_TYPES[value] for value in self._grid.tolist())
 
 class MultiLevelCarPark:
-    def __init__(self, levels: int, rows: int, cols: int) -> None:
-        self.levels = self._construct_carpark(levels, rows, cols)
-        self.rows = rows
-        self.length = len(self.levels[0])
-        self.width = len(self.levels[0][0])
-        self.south_entrance = (self.length - 2, 1)
+    def __init__(self, levels: int = 6, rows: int = 10, cols: int = 20, layout: Layout | None = None) -> None:
+        """
+        Args:
+            levels, rows, cols: The dimensions of the original carpark layout, see `generate_layout`.
+            layout: The layout of the carpark instead, e.g. from `generate_layout` with more blocks or an irregular footprint.
+        """
+        self.layout = generate_layout(levels, rows, cols) if layout is None else layout
+        # the whole carpark is held in one contiguous (levels, length, width) array of `CellType` values,
+        # which `levels` writes through to keep the index of free parking spaces below up to date,
+        # whereas writing to `grid` directly must be followed by `rebuild_index`
+        self.grid = self.layout.grid()
+        self.levels = GridView(self.grid, self)
+        self.flat_levels = self.grid.reshape(len(self.grid), -1)
+        self.length = self.grid.shape[1]
+        self.width = self.grid.shape[2]
+        # the number of parking rows between the ramp rows, see `generate_layout`
+        self.rows = 2 * ((self.length - 2) // 3)
+        # the (position, direction) drivers can enter the bottom level at from the street, the first by default
+        self.entrances = self.layout.entrances
+        self.south_entrance = self.entrances[0][0]
+
+        # the cell at the end of each ramp as a flat index (row * width + column),
+        # with the level change and where a driver arrives facing which way
+        self.transitions = self.layout.transitions
+        # whether the carpark is a single block, whose entrances and ramps below the hand-written drivers' routes assume
+        self.single_block = self.transitions == block_transitions(self.length, self.width, 1, self.width - 2)
         self.north_entrance = (1, self.width - 2)
         self.south_ramp = (self.length - 2, self.width - 2)
         self.north_ramp = (1, 1)
 
-        self.parking_cells = []
-        for i, row in enumerate(self.levels[-1]):
-            for j, cell in enumerate(row):
-                if cell == CellType.OCCUPIED:
-                    self.parking_cells.append((i, j))
-
-    def _construct_carpark(self, levels: int, rows: int, cols: int) -> List[List[List[CellType]]]:
-        carpark = []
-        for _ in range(levels):
-            level = [
-                [CellType.VOID] + [CellType.RAMP] * cols + [CellType.VOID],
-                [CellType.OCCUPIED, CellType.RAMP] + [CellType.OCCUPIED] * (cols - 2) + [CellType.ROAD, CellType.OCCUPIED]
-            ]
-            for _ in range(rows // 2 - 1):
-                level += [
-                    [CellType.OCCUPIED] + [CellType.ROAD] * cols + [CellType.OCCUPIED],
-                    [CellType.OCCUPIED, CellType.ROAD] + [CellType.OCCUPIED] * (cols - 2) + [CellType.ROAD, CellType.OCCUPIED],
-                    [CellType.OCCUPIED, CellType.ROAD] + [CellType.OCCUPIED] * (cols - 2) + [CellType.ROAD, CellType.OCCUPIED]
-                ]
-            level += [
-                [CellType.OCCUPIED] + [CellType.ROAD] * cols + [CellType.OCCUPIED],
-                [CellType.OCCUPIED, CellType.ROAD] + [CellType.OCCUPIED] * (cols - 2) + [CellType.RAMP, CellType.OCCUPIED],
-                [CellType.VOID] + [CellType.RAMP] * cols + [CellType.VOID]
-            ]
-            carpark.append(level)
-
-        carpark[-1][1][1] = CellType.OCCUPIED
-        carpark[-1][-2][-2] = CellType.OCCUPIED
-        
-        return carpark
+        self.parking_cells = [(i, j) for i, j in np.argwhere(self.grid[-1] == CellType.OCCUPIED.value).tolist()]
+        self._vacancy_cells, self._vacancy_weights = self._vacancy_distribution()
+
+        # the unoccupied parking spaces of each level as flat indices (row * width + column), kept up to date
+        # by `set_capacity`, `reset_capacity`, `occupy`, `vacate` and writes to `levels` rather than by rescanning the grid
+        levels = len(self.grid)
+        self.free_bays = [set() for _ in range(levels)]
+        self.free_counts = np.zeros(levels, dtype=np.int64)
+        # and how many are in each row of each level, with a bitmask per level of the rows that have any,
+        # so that whether a set of rows has a free parking space is a single AND, see `DriverBase._skip_ahead`
+        self.free_rows = np.zeros((levels, self.length), dtype=np.int64)
+        self.free_row_masks = [0] * levels
     
     def set_capacity(self, capacity: float, seed: int = 0) -> None:
         self.reset_capacity()
-        random.seed(seed)
-        visited = [set([1, len(self.parking_cells) - 2]) for _ in range(len(self.levels) - 1)] + [set()]
-        unnoccupied_count = round((1.0 - capacity) * len(self.parking_cells))
-        for _ in range(unnoccupied_count):
-            # randomly select a level, favoring the top levels
-            k = max(0, len(self.levels) - 1 - round(abs(random.normal(0, (len(self.levels) - 1) / 2.6))))
-            # randomly select a cell in the level, favoring the middle rows
-            c = max(0, min(round(random.normal(len(self.parking_cells) / 2, len(self.parking_cells) / 8)), len(self.parking_cells) - 1))
-            # check if the cell is already unoccupied - if it is, linearly search for the next unoccupied cell
-            l, r = c - 1, c + 1
-            while c in visited[k]:
-                if l not in visited[k]:
-                    c = l
-                    break
-                if r not in visited[k]:
-                    c = r
-                    break
-                l = (l - 1) % len(self.parking_cells)
-                r = (r + 1) % len(self.parking_cells)
-
-            i, j = self.parking_cells[c]
-            self.levels[k][i][j] = CellType.UNOCCUPIED
-            visited[k].add(c)
+        vacancies = self.sample_vacancies(capacity, seed)
+        self.grid.reshape(-1)[vacancies] = CellType.UNOCCUPIED.value
+        self._index(vacancies)
+
+    def _index(self, vacancies: np.ndarray) -> None:
+        # add the unoccupied parking spaces at the given flat indices into `grid` to the cleared index
+        levels, cells = np.divmod(vacancies, self.length * self.width)
+        for level, cell in zip(levels.tolist(), cells.tolist()):
+            self.free_bays[level].add(cell)
+        self.free_counts[:] = np.bincount(levels, minlength=len(self.grid))
+        self.free_rows[:] = np.bincount(
+            levels * self.length + cells // self.width, minlength=self.free_rows.size
+        ).reshape(self.free_rows.shape)
+        for level, rows in enumerate(self.free_rows):
+            self.free_row_masks[level] = sum(1 << row for row in np.flatnonzero(rows).tolist())
+
+    def occupy(self, level: int, cell: int) -> None:
+        """
+        Park a car in an unoccupied parking space.
+        
+        Args:
+            level: The level of the parking space.
+            cell: The flat index (row * width + column) of the parking space in the level.
+        """
+        if self.flat_levels[level, cell] != CellType.UNOCCUPIED.value:
+            raise ValueError(f"cell {divmod(cell, self.width)} on level {level} is not an unoccupied parking space")
+        self.flat_levels[level, cell] = CellType.OCCUPIED.value
+        self._count_free(level, cell, -1)
+
+    def vacate(self, level: int, cell: int) -> None:
+        """
+        Free an occupied parking space.
+        
+        Args:
+            level: The level of the parking space.
+            cell: The flat index (row * width + column) of the parking space in the level.
+        """
+        if self.flat_levels[level, cell] != CellType.OCCUPIED.value:
+            raise ValueError(f"cell {divmod(cell, self.width)} on level {level} is not an occupied parking space")
+        self.flat_levels[level, cell] = CellType.UNOCCUPIED.value
+        self._count_free(level, cell, 1)
+
+    def _count_free(self, level: int, cell: int, change: int) -> None:
+        # add (1) or remove (-1) a parking space to or from the index of free parking spaces
+        if change > 0:
+            self.free_bays[level].add(cell)
+        else:
+            self.free_bays[level].remove(cell)
+        self.free_counts[level] += change
+        row = cell // self.width
+        self.free_rows[level, row] += change
+        if self.free_rows[level, row]:
+            self.free_row_masks[level] |= 1 << row
+        else:
+            self.free_row_masks[level] &= ~(1 << row)
+
+    def _write(self, cells: np.ndarray, value: int) -> None:
+        """
+        Set cells of the grid to a `CellType` value, updating the index of free parking spaces, as `levels` does.
+
+        Args:
+            cells: Flat indices into `grid`.
+            value: The `CellType` value.
+        """
+        levels, cells = np.divmod(cells, self.length * self.width)
+        for level, cell in zip(levels.tolist(), cells.tolist()):
+            free = self.flat_levels[level, cell] == _UNOCCUPIED
+            self.flat_levels[level, cell] = value
+            if free != (value == _UNOCCUPIED):
+                self._count_free(level, cell, -1 if free else 1)
+
+    def rebuild_index(self) -> None:
+        """
+        Rebuild the index of free parking spaces (`free_bays`, `free_counts`, `free_rows` and `free_row_masks`)
+        from the grid, which must be done after writing to `grid` directly rather than through `levels`,
+        since drivers rely on the index to skip parts of the carpark with no free parking space.
+        """
+        self._clear_index()
+        self._index(np.flatnonzero(self.grid.reshape(-1) == _UNOCCUPIED))
+
+    def sample_vacancies(self, capacity: float, seed: int = 0) -> np.ndarray:
+        """
+        Randomly select the parking cells left unoccupied at the given capacity, without modifying the carpark.
+        All vacancies are drawn in one batch, without replacement, from the distribution described in
+        `_vacancy_distribution`, so a given seed always produces the same layout.
+        
+        Args:
+            capacity: The fraction of parking cells that are occupied.
+            seed: The seed of the random number generator.
+        
+        Returns:
+            An array of flat indices into `grid` of the unoccupied cells.
+        """
+        count = min(round((1.0 - capacity) * len(self.parking_cells)), len(self._vacancy_cells))
+        if count <= 0:
+            return self._vacancy_cells[:0]
+
+        # weighted sampling without replacement: keep the cells with the smallest exponential keys
+        rng = np.random.default_rng(seed)
+        with np.errstate(divide="ignore"):
+            keys = rng.exponential(size=len(self._vacancy_weights)) / self._vacancy_weights
+        return self._vacancy_cells[np.argpartition(keys, count - 1)[:count]]
+
+    def _vacancy_distribution(self) -> Tuple[np.ndarray, np.ndarray]:
+        """
+        Weight every parking cell by how likely it is to be left unoccupied.
+        A level is picked with a rounded half-normal distance from the top level, favoring the top levels,
+        and a cell in the level with a rounded normal around the middle of `parking_cells`, favoring the middle rows.
+        
+        Returns:
+            A tuple of (flat indices into `grid`, weights) of every cell that can be left unoccupied.
+        """
+        erf = np.vectorize(math.erf)
+        levels, n = len(self.grid), len(self.parking_cells)
+
+        if levels > 1:
+            d = np.arange(levels, dtype=float)
+            scale = (levels - 1) / 2.6 * math.sqrt(2)
+            upper = erf(np.append(d[:-1] + 0.5, np.inf) / scale)
+            lower = erf(np.maximum(d - 0.5, 0) / scale)
+            level_weights = (upper - lower)[::-1]
+        else:
+            level_weights = np.ones(1)
+
+        c = np.arange(n, dtype=float)
+        scale = n / 8 * math.sqrt(2)
+        upper = erf((np.append(c[:-1] + 0.5, np.inf) - n / 2) / scale)
+        lower = erf((np.insert(c[1:] - 0.5, 0, -np.inf) - n / 2) / scale)
+        cell_weights = upper - lower
+
+        rows, cols = np.array(self.parking_cells).T
+        cells = (np.arange(levels)[:, np.newaxis] * self.length + rows) * self.width + cols
+        weights = np.outer(level_weights, cell_weights)
+        # the ramps of the lower levels sit where the top level has parking cells
+        parking = self.grid[:, rows, cols] == CellType.OCCUPIED.value
+        return cells[parking], weights[parking]
     
     def reset_capacity(self) -> None:
-        for level in self.levels:
-            for row in level:
-                for i in range(len(row)):
-                    if row[i] == CellType.UNOCCUPIED:
-                        row[i] = CellType.OCCUPIED
+        self.grid[self.grid == CellType.UNOCCUPIED.value] = CellType.OCCUPIED.value
+        self._clear_index()
+
+    def _clear_index(self) -> None:
+        for bays in self.free_bays:
+            bays.clear()
+        self.free_counts[:] = 0
+        self.free_rows[:] = 0
+        self.free_row_masks = [0] * len(self.grid)
     
 
 if __name__ == "__main__":
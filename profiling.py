@@ -0,0 +1,189 @@
+"""
+Opt-in instrumentation of the simulation: per-phase call counts and times, and per-driver counters.
+Nothing is instrumented unless `profiled` is active, so the hot loop carries no overhead otherwise.
+"""
+from parking import MultiLevelCarPark
+from driver_base import DriverBase
+from geometry import RoadNetwork
+from collections import Counter, defaultdict
+from contextlib import contextmanager
+from functools import wraps
+import json
+import numpy as np
+from time import perf_counter_ns
+from typing import Callable, Dict, Iterator, List, Tuple, Type
+
+# the phases timed, as (class, method name), with `_generate_path` timed on every driver class that defines it
+_PHASES = (
+    (DriverBase, "search_for_parking"),
+    (DriverBase, "_check_fov"),
+    (DriverBase, "_find_parking"),
+    (DriverBase, "_calculate_path_to_park"),
+    (DriverBase, "_change_level"),
+    (MultiLevelCarPark, "set_capacity"),
+    (MultiLevelCarPark, "reset_capacity"),
+    (RoadNetwork, "_search"),
+)
+# the counters kept per driver class
+DRIVER_COUNTERS = ("searches", "ticks", "ticks_stepped", "bfs_expansions", "levels_visited")
+
+class Profile:
+    """
+    Counters aggregated over any number of searches, e.g. a whole sweep, which can be combined with `merge`.
+
+    Attributes:
+        calls: The number of calls of each phase.
+        nanoseconds: The total time spent in each phase. Times are inclusive, so a phase called from another,
+            such as `_find_parking` from `_check_fov` or `reset_capacity` from `set_capacity`, is counted in both.
+        drivers: For each driver class name, the number of `searches`, the `ticks` they took in total,
+            the `ticks_stepped` one at a time rather than skipped over, the cells expanded by the road BFS searches
+            they triggered (`bfs_expansions`, which only happen the first time a `RoadNetwork` searches from a cell)
+            and the `levels_visited`, counting a level each time it is entered.
+    """
+    def __init__(self) -> None:
+        self.calls: Counter = Counter()
+        self.nanoseconds: Counter = Counter()
+        self.drivers: Dict[str, Counter] = defaultdict(Counter)
+        # the class name of the driver searching, which BFS expansions are counted against
+        self._driver = None
+
+    def merge(self, other: "Profile") -> None:
+        """
+        Add the counters of another `Profile`.
+        """
+        self.calls.update(other.calls)
+        self.nanoseconds.update(other.nanoseconds)
+        for name, counters in other.drivers.items():
+            self.drivers[name].update(counters)
+
+    def to_dict(self) -> Dict:
+        return {
+            "phases": {
+                phase: {"calls": self.calls[phase], "nanoseconds": self.nanoseconds[phase]} for phase in sorted(self.calls)
+            },
+            "drivers": {name: {counter: counters[counter] for counter in DRIVER_COUNTERS} for name, counters in sorted(self.drivers.items())},
+        }
+
+    def save(self, path: str) -> None:
+        """
+        Write the profile to a JSON file, as `to_dict`.
+        """
+        with open(path, "w") as f:
+            json.dump(self.to_dict(), f, indent=2)
+
+    def report(self) -> str:
+        """
+        The profile as a table of phases by total time, then a line per driver class.
+        """
+        lines = [f"{'Phase':<26}{'Calls':>12}{'Total ms':>12}{'Mean us':>10}"]
+        for phase, nanoseconds in self.nanoseconds.most_common():
+            calls = self.calls[phase]
+            lines.append(f"{phase:<26}{calls:>12}{nanoseconds / 1e6:>12.1f}{nanoseconds / calls / 1e3:>10.2f}")
+        for name, counters in sorted(self.drivers.items()):
+            searches = max(counters["searches"], 1)
+            lines.append(
+                f"{name} - Searches: {counters['searches']}, Ticks: {counters['ticks']} "
+                f"({counters['ticks_stepped'] / max(counters['ticks'], 1):.0%} stepped), "
+                f"BFS expansions: {counters['bfs_expansions']}, Levels visited per search: {counters['levels_visited'] / searches:.2f}"
+            )
+        return "\n".join(lines)
+
+def _timed(profile: Profile, phase: str, method: Callable) -> Callable:
+    @wraps(method)
+    def timed(*args, **kwargs):
+        start = perf_counter_ns()
+        try:
+            return method(*args, **kwargs)
+        finally:
+            profile.nanoseconds[phase] += perf_counter_ns() - start
+            profile.calls[phase] += 1
+    return timed
+
+def _driver_classes(base: Type[DriverBase]) -> Iterator[Type[DriverBase]]:
+    for driver_class in base.__subclasses__():
+        yield driver_class
+        yield from _driver_classes(driver_class)
+
+def _instrument(profile: Profile) -> List[Tuple[type, str, Callable]]:
+    """
+    Replace the methods profiled with wrappers that count into `profile`.
+
+    Returns:
+        The (class, name, method replaced) of every replacement, in the order they were made.
+    """
+    timed = [(owner, name, owner.__dict__[name]) for owner, name in _PHASES]
+    timed += [
+        (driver_class, "_generate_path", driver_class.__dict__["_generate_path"])
+        for driver_class in set(_driver_classes(DriverBase)) if "_generate_path" in driver_class.__dict__
+    ]
+    for owner, name, method in timed:
+        setattr(owner, name, _timed(profile, name, method))
+    # wrapped again to count, the ticks only being counted since timing each would distort the phases they call
+    search, tick, change_level, bfs = (
+        DriverBase.search_for_parking, DriverBase._tick, DriverBase._change_level, RoadNetwork._search
+    )
+
+    @wraps(search)
+    def search_for_parking(self, *args, **kwargs):
+        name = type(self).__name__
+        previous, profile._driver = profile._driver, name
+        try:
+            time = search(self, *args, **kwargs)
+        finally:
+            profile._driver = previous
+        counters = profile.drivers[name]
+        counters["searches"] += 1
+        counters["ticks"] += time
+        counters["levels_visited"] += 1
+        return time
+
+    @wraps(tick)
+    def _tick(self):
+        profile.drivers[type(self).__name__]["ticks_stepped"] += 1
+        tick(self)
+
+    @wraps(change_level)
+    def _change_level(self):
+        changed = change_level(self)
+        if changed:
+            profile.drivers[type(self).__name__]["levels_visited"] += 1
+        return changed
+
+    @wraps(bfs)
+    def _search(self, source):
+        bfs(self, source)
+        # every ROAD cell reached was expanded, as was the source
+        road = np.frombuffer(self._road, dtype=np.uint8).astype(bool)
+        expanded = np.count_nonzero(road & (self._parents[source] >= 0)) + (not road[source])
+        profile.drivers[profile._driver or "-"]["bfs_expansions"] += int(expanded)
+
+    counted = [(DriverBase, "_tick", tick), (DriverBase, "_change_level", change_level)]
+    DriverBase.search_for_parking = search_for_parking
+    DriverBase._tick = _tick
+    DriverBase._change_level = _change_level
+    RoadNetwork._search = _search
+    return timed + counted
+
+@contextmanager
+def profiled(profile: Profile) -> Iterator[Profile]:
+    """
+    Count the phases of every search and capacity change within the block into `profile`, e.g.
+
+        profile = Profile()
+        with profiled(profile):
+            carpark.set_capacity(0.9, seed)
+            driver.reset()
+            driver.search_for_parking()
+        print(profile.report())
+
+    The methods of `DriverBase`, its subclasses, `MultiLevelCarPark` and `RoadNetwork` are wrapped on entry and
+    restored on exit, so that outside the block nothing is instrumented. Only one `profiled` block may be active
+    at a time, and the vectorized `batch` simulation, which does not go through these methods, is not profiled.
+    """
+    replaced = _instrument(profile)
+    try:
+        yield profile
+    finally:
+        # in reverse, since methods both timed and counted were replaced twice
+        for owner, name, method in reversed(replaced):
+            setattr(owner, name, method)
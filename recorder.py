@@ -0,0 +1,93 @@
+"""
+Headless recording of driver trajectories, for debugging and for rendering searches offline.
+"""
+from parking import MultiLevelCarPark
+from driver_base import DriverBase
+from geometry import field_of_view
+from render import FrameRenderer
+from time import sleep
+import numpy as np
+from typing import Iterator, List, Tuple
+
+# one record per tick: 12 bytes
+TRACE_DTYPE = np.dtype([
+    ("level", np.uint16),
+    ("cell", np.uint32),  # flat index (row * width + column) of the driver's position
+    ("heading", np.uint8),  # index into DIRECTIONS
+    ("fov_hit", np.int32),  # flat index of the first free parking space in the FOV, or -1
+    ("pathing_to_park", np.bool_),
+])
+
+class TrajectoryRecorder:
+    """
+    Records the state of a driver at the start of its search and after every tick, in a preallocated
+    structured array of `TRACE_DTYPE` that grows by doubling, so that record `t` is the state at time `t`.
+    Attach it to a driver with `driver.recorder = TrajectoryRecorder()`, it is cleared whenever the driver is reset.
+    """
+    def __init__(self, capacity: int = 1024) -> None:
+        self._records = np.empty(capacity, dtype=TRACE_DTYPE)
+        self._length = 0
+
+    def __len__(self) -> int:
+        return self._length
+
+    @property
+    def trace(self) -> np.ndarray:
+        """
+        The records so far, as a view into the recorder's buffer.
+        """
+        return self._records[:self._length]
+
+    def clear(self) -> None:
+        self._length = 0
+
+    def record(self, driver: DriverBase) -> None:
+        if self._length == len(self._records):
+            self._records = np.resize(self._records, 2 * len(self._records))
+        self._records[self._length] = (
+            driver.current_level,
+            driver.cell,
+            driver.heading,
+            driver._find_parking() if driver._fov_row >= 0 else -1,
+            driver.pathing_to_park,
+        )
+        self._length += 1
+
+    def save(self, path: str) -> None:
+        """
+        Write the trace to a `.npy` file, which `load_trace` can memory-map.
+        """
+        np.save(path, self.trace)
+
+def load_trace(path: str) -> np.ndarray:
+    """
+    Memory-map a trace written by `TrajectoryRecorder.save`, so that only the records used are read.
+    """
+    return np.load(path, mmap_mode="r")
+
+def frames(trace: np.ndarray, carpark: MultiLevelCarPark) -> Iterator[Tuple[List[List[str]], str]]:
+    """
+    Render each record of a trace the way `DriverBase.display` shows the driver, without its path.
+    The carpark must have the layout the trace was recorded on, e.g. by setting the same capacity and seed.
+    
+    Yields:
+        Tuples of (cell symbols, status line), see `FrameRenderer`.
+    """
+    table = field_of_view(carpark.length, carpark.width)
+    for time, (level, cell, heading, _, _) in enumerate(trace.tolist()):
+        pos = divmod(cell, carpark.width)
+        fov = table.rows[4 * cell + heading] if time else ()
+        yield DriverBase._draw_frame(carpark.grid[level], pos, fov, (), time, level)
+
+def replay(trace: np.ndarray, carpark: MultiLevelCarPark, delay: float = 0.1) -> None:
+    """
+    Animate a trace in the terminal, see `frames`.
+    """
+    renderer = FrameRenderer()
+    try:
+        for cells, status in frames(trace, carpark):
+            renderer.draw(cells, status)
+            sleep(delay)
+    finally:
+        # restore the cursor even if interrupted
+        renderer.close()
@@ -0,0 +1,85 @@
+"""
+Flicker-free animation of a grid of cells in the terminal.
+"""
+import sys
+from typing import List, TextIO
+
+def _move(line: int, target: int) -> str:
+    """
+    The escape code moving the cursor from one line to another in the same column.
+    """
+    if target < line:
+        return f"\x1b[{line - target}A"
+    if target > line:
+        return f"\x1b[{target - line}B"
+    return ""
+
+class FrameRenderer:
+    """
+    Draws successive frames of a grid of cells, each cell being one visible character (possibly colorized),
+    inside a border with a status line below.
+    The first frame is written in full. After that only the cells that differ from the previous frame are
+    rewritten, using cursor movement escape codes, with a single buffered write per frame.
+    """
+    def __init__(self, stream: TextIO | None = None) -> None:
+        """
+        Args:
+            stream: The stream to draw on, by default `sys.stdout` as it is when the renderer is created,
+                so that redirecting it, e.g. with `contextlib.redirect_stdout`, is respected.
+        """
+        self.stream = sys.stdout if stream is None else stream
+        self._cells = None
+        self._status = None
+
+    @staticmethod
+    def format(cells: List[List[str]], status: str) -> str:
+        """
+        The full frame as text, ending with a newline.
+        """
+        m = len(cells[0]) if cells else 0
+        lines = [f"┌{"─"*m*3}─┐"]
+        lines.extend(f"│{"".join(f" {cell} " for cell in row)} │" for row in cells)
+        lines.append(f"└{"─"*m*3}─┘")
+        lines.append(status)
+        return "\n".join(lines) + "\n"
+
+    def draw(self, cells: List[List[str]], status: str) -> None:
+        """
+        Draw the next frame, below the cursor if it is the first one and over the previous frame otherwise.
+        """
+        out = []
+        if self._cells is None or len(cells) != len(self._cells) or len(cells[0]) != len(self._cells[0]):
+            if self._cells is not None:
+                # the dimensions changed, clear the previous frame and start over
+                out.append(f"\x1b[{len(self._cells) + 3}A\x1b[J")
+            out.append("\x1b[?25l")  # hide the cursor while animating
+            out.append(self.format(cells, status))
+        else:
+            # lines are counted from the top border, the cursor rests on the line below the status line
+            height = len(cells) + 3
+            line = height
+            for i, (row, previous) in enumerate(zip(cells, self._cells)):
+                for j, cell in enumerate(row):
+                    if cell != previous[j]:
+                        out.append(_move(line, i + 1))
+                        out.append(f"\x1b[{3 * j + 3}G{cell}")
+                        line = i + 1
+            if status != self._status:
+                out.append(_move(line, height - 1))
+                out.append(f"\x1b[2K\x1b[1G{status}")
+                line = height - 1
+            out.append(_move(line, height))
+            out.append("\x1b[1G")
+
+        self._cells = cells
+        self._status = status
+        self.stream.write("".join(out))
+        self.stream.flush()
+
+    def close(self) -> None:
+        """
+        Finish animating, leaving the last frame on screen and the cursor below it.
+        """
+        self.stream.write("\x1b[?25h")
+        self.stream.flush()
+        self._cells = self._status = None
@@ -0,0 +1,96 @@
+"""
+Streaming summary statistics, so that samples never have to be kept in memory.
+"""
+import math
+import numpy as np
+from typing import Tuple
+
+class StreamingStats:
+    """
+    Summary statistics of a stream of integer samples, such as search times, updated one batch at a time.
+    The mean and variance are updated in one pass (Chan et al.'s parallel algorithm) and the quantiles are
+    exact, read from a histogram whose size is bounded by the range of the samples rather than their number.
+    Statistics from independent streams, e.g. from different workers, can be combined with `merge`.
+    """
+    def __init__(self) -> None:
+        self.count = 0
+        self.mean = 0.0
+        self._m2 = 0.0
+        self.min = None
+        self.max = None
+        self._offset = 0
+        self._histogram = np.zeros(0, dtype=np.int64)
+
+    def update(self, samples) -> None:
+        """
+        Add a batch of integer samples.
+        """
+        samples = np.asarray(samples)
+        if not len(samples):
+            return
+        if not np.issubdtype(samples.dtype, np.integer):
+            raise TypeError(f"StreamingStats only accepts integer samples, got {samples.dtype}")
+
+        lo, hi = int(samples.min()), int(samples.max())
+        histogram = np.bincount(samples - lo, minlength=hi - lo + 1)
+        mean = float(samples.mean())
+        self._combine(len(samples), mean, float(((samples - mean) ** 2).sum()), lo, hi, lo, histogram)
+
+    def merge(self, other: "StreamingStats") -> None:
+        """
+        Add all the samples summarized by another `StreamingStats`.
+        """
+        if other.count:
+            self._combine(other.count, other.mean, other._m2, other.min, other.max, other._offset, other._histogram)
+
+    def _combine(self, count: int, mean: float, m2: float, lo: int, hi: int, offset: int, histogram: np.ndarray) -> None:
+        total = self.count + count
+        delta = mean - self.mean
+        self._m2 += m2 + delta * delta * self.count * count / total
+        self.mean += delta * count / total
+
+        if self.count:
+            start, stop = min(self._offset, offset), max(self._offset + len(self._histogram), offset + len(histogram))
+            merged = np.zeros(stop - start, dtype=np.int64)
+            merged[self._offset - start:self._offset - start + len(self._histogram)] += self._histogram
+            merged[offset - start:offset - start + len(histogram)] += histogram
+            self._offset, self._histogram = start, merged
+            self.min, self.max = min(self.min, lo), max(self.max, hi)
+        else:
+            self._offset, self._histogram = offset, histogram.astype(np.int64)
+            self.min, self.max = lo, hi
+        self.count = total
+
+    def variance(self, ddof: int = 0) -> float:
+        return self._m2 / (self.count - ddof) if self.count > ddof else math.nan
+
+    @property
+    def stdev(self) -> float:
+        """
+        The population standard deviation, like `np.std`.
+        """
+        return math.sqrt(self.variance())
+
+    def confidence_interval(self, z: float = 1.96) -> Tuple[float, float]:
+        """
+        The confidence interval of the mean by the normal approximation, 95% for the default `z`,
+        which is unbounded until there are at least 2 samples.
+        """
+        half_width = z * math.sqrt(self.variance(ddof=1) / self.count) if self.count > 1 else math.inf
+        return self.mean - half_width, self.mean + half_width
+
+    def quantile(self, q: float) -> float:
+        """
+        The q-th quantile of the samples, interpolated like `np.quantile`.
+        """
+        if not self.count:
+            return math.nan
+        position = (self.count - 1) * q
+        below, above = math.floor(position), math.ceil(position)
+        cumulative = np.cumsum(self._histogram)
+        lower, upper = self._offset + np.searchsorted(cumulative, [below, above], side="right")
+        return float(lower + (position - below) * (upper - lower))
+
+    @property
+    def median(self) -> float:
+        return self.quantile(0.5)
@@ -0,0 +1,116 @@
+"""
+On-disk storage of the raw search times of a sweep, so that an interrupted sweep can be resumed
+and its statistics recomputed without simulating again.
+"""
+from stats import StreamingStats
+import json
+import numpy as np
+import os
+from typing import Dict, Iterator, List, Sequence, Set, Tuple
+
+class ResultStore:
+    """
+    A directory holding the configuration of a sweep in `meta.json` and one `.npz` file per completed chunk of seeds,
+    named after its capacity and range of seed offsets within the capacity, with the search times of every driver
+    as a (drivers, seeds) array. The configuration fixes the sample size and chunk size, so the chunks of a capacity
+    never overlap, whichever capacities they were simulated alongside.
+    Files are written under a temporary name and renamed into place, so a chunk is either stored completely
+    or not at all, and a stored chunk is never written again.
+    """
+    def __init__(self, directory: str, config: Dict | None) -> None:
+        """
+        Open the store in `directory`, creating it if needed.
+
+        Args:
+            directory: The directory of the store.
+            config: The configuration of the sweep, which must match the one the store was created with,
+                since samples simulated under another configuration cannot be combined,
+                or None to open an existing store with its configuration, e.g. to `aggregate` it.
+        """
+        self.directory = directory
+        self.config = config
+        meta = os.path.join(directory, "meta.json")
+        if config is None:
+            if not os.path.exists(meta):
+                raise ValueError(f"there is no store in {directory}")
+            with open(meta) as f:
+                self.config = json.load(f)
+            return
+
+        os.makedirs(directory, exist_ok=True)
+        if os.path.exists(meta):
+            with open(meta) as f:
+                stored = json.load(f)
+            if stored != json.loads(json.dumps(config)):
+                raise ValueError(f"the store in {directory} was created for {stored}, not {config}")
+        else:
+            self._replace(meta, lambda path: self._write_json(path, config))
+
+    @staticmethod
+    def _write_json(path: str, config: Dict) -> None:
+        with open(path, "w") as f:
+            json.dump(config, f, indent=2)
+
+    @staticmethod
+    def _replace(path: str, write) -> None:
+        # write beside the destination then rename, which is atomic on the same filesystem
+        temporary = f"{path}.{os.getpid()}.tmp"
+        try:
+            write(temporary)
+            os.replace(temporary, path)
+        finally:
+            if os.path.exists(temporary):
+                os.remove(temporary)
+
+    def _path(self, capacity: float, start: int, stop: int) -> str:
+        return os.path.join(self.directory, f"chunk_{float(capacity)!r}_{start}_{stop}.npz")
+
+    def completed(self) -> Set[Tuple[float, int, int]]:
+        """
+        The (capacity, start, stop) of every chunk stored, by seed offset within the capacity.
+        """
+        chunks = set()
+        for name in os.listdir(self.directory):
+            if name.startswith("chunk_") and name.endswith(".npz"):
+                capacity, start, stop = name[len("chunk_"):-len(".npz")].split("_")
+                chunks.add((float(capacity), int(start), int(stop)))
+        return chunks
+
+    def write(self, capacity: float, start: int, stop: int, times: np.ndarray) -> None:
+        """
+        Store the search times of every driver on the seed offsets in [start, stop) within a capacity.
+        """
+        def write(path: str) -> None:
+            with open(path, "wb") as f:
+                np.savez(f, times=times)
+
+        self._replace(self._path(capacity, start, stop), write)
+
+    def read(self, capacity: float, start: int, stop: int) -> np.ndarray:
+        """
+        The search times of every driver on the seed offsets in [start, stop) within a capacity, as stored by `write`.
+        """
+        with np.load(self._path(capacity, start, stop)) as chunk:
+            return chunk["times"]
+
+    def capacities(self) -> List[float]:
+        """
+        The capacities with any chunk stored, in increasing order.
+        """
+        return sorted({capacity for capacity, _, _ in self.completed()})
+
+    def aggregate(self, capacities: Sequence[float]) -> Iterator[Tuple[StreamingStats, ...]]:
+        """
+        Summarize every stored search time, without simulating.
+
+        Yields:
+            For each capacity in order, the `StreamingStats` of the search times of each driver,
+            which are empty if no chunk of the capacity is stored.
+        """
+        completed = sorted(self.completed())
+        for capacity in capacities:
+            stats = tuple(StreamingStats() for _ in self.config["drivers"])
+            for _, start, stop in (chunk for chunk in completed if chunk[0] == capacity):
+                for driver_stats, times in zip(stats, self.read(capacity, start, stop)):
+                    driver_stats.update(times)
+            yield stats
@@ -0,0 +1,310 @@
+"""
+Search strategies described declaratively by a `RouteSpec` and compiled once per carpark geometry,
+instead of each being a driver class with a hand-written `_generate_path`.
+"""
+from parking import MultiLevelCarPark, CellType
+from driver_base import DriverBase
+from geometry import DIRECTIONS, Route, field_of_view
+from collections import deque
+from dataclasses import dataclass, replace
+from functools import lru_cache
+import numpy as np
+from typing import Callable, Dict, List, Sequence, Tuple, Type
+
+def _middle_out(levels: int, seed: int) -> List[int]:
+    middle = levels // 2
+    order = [middle]
+    for k in range(1, levels):
+        order.extend(level for level in (middle + k, middle - k) if 0 <= level < levels)
+    return order
+
+# the order the levels are searched in, by the number of levels and a seed
+LEVEL_ORDERS: Dict[str, Callable[[int, int], Sequence[int]]] = {
+    "bottom_up": lambda levels, seed: range(levels),
+    "top_down": lambda levels, seed: range(levels - 1, -1, -1),
+    "middle_out": _middle_out,
+    "random": lambda levels, seed: np.random.default_rng(seed).permutation(levels).tolist(),
+}
+SWEEPS = ("serpentine", "direct")
+RAMPS = ("nearest", "north", "south")
+
+@dataclass(frozen=True)
+class RouteSpec:
+    """
+    A search strategy as the order to search the levels in, how to drive each level and which ramps to take.
+
+    Attributes:
+        order: The name of a level order in `LEVEL_ORDERS`, or the levels to search in turn.
+        sweep: How to drive a level being searched, "serpentine" through every aisle from the end the driver
+            enters at, or "direct" to the ramp for the next level, either for all levels or one per level searched.
+            The last level searched is always driven serpentine, and levels passed through to get to the next
+            level searched are always driven direct.
+        ramp: Which ramp to take between levels, the "nearest" to the driver or always the "north" or "south" one.
+        seed: The seed of a "random" level order.
+        entrance: The index of the entrance in `carpark.entrances` the route starts at.
+    """
+    order: str | Tuple[int, ...] = "bottom_up"
+    sweep: str | Tuple[str, ...] = "serpentine"
+    ramp: str = "nearest"
+    seed: int = 0
+    entrance: int = 0
+
+    def __post_init__(self) -> None:
+        if isinstance(self.order, str) and self.order not in LEVEL_ORDERS:
+            raise ValueError(f"unknown level order {self.order!r}, expected one of {', '.join(LEVEL_ORDERS)}")
+        for sweep in (self.sweep,) if isinstance(self.sweep, str) else self.sweep:
+            if sweep not in SWEEPS:
+                raise ValueError(f"unknown sweep {sweep!r}, expected one of {', '.join(SWEEPS)}")
+        if self.ramp not in RAMPS:
+            raise ValueError(f"unknown ramp {self.ramp!r}, expected one of {', '.join(RAMPS)}")
+        if self.entrance < 0:
+            raise ValueError(f"entrance must be an index into the carpark's entrances, not {self.entrance}")
+
+    def visits(self, levels: int) -> List[Tuple[int, str]]:
+        """
+        The levels to search in turn, each with how it is driven.
+        """
+        order = LEVEL_ORDERS[self.order](levels, self.seed) if isinstance(self.order, str) else self.order
+        order = [int(level) for level in order]
+        if any(not 0 <= level < levels for level in order):
+            raise ValueError(f"level order {order} is not within the {levels} levels of the carpark")
+        sweeps = [self.sweep] * len(order) if isinstance(self.sweep, str) else list(self.sweep)
+        if len(sweeps) != len(order):
+            raise ValueError(f"{len(sweeps)} sweeps given for {len(order)} levels searched")
+        return [(level, sweep) for level, sweep in zip(order, sweeps[:-1] + ["serpentine"])]
+
+class CompiledRoute:
+    """
+    The route a driver following a `RouteSpec` takes when it never finds a parking space.
+    `segments` holds the (level, start, route) of the path driven on each level between ramps, which drivers follow,
+    and `levels`, `rows` and `ramps` the level, `FieldOfView` table row and whether it ends a segment at a ramp
+    of every step, which `batch.simulate_layouts` checks every layout along at once.
+    """
+    def __init__(self, segments: List[Tuple[int, Tuple[int, int], Route]], width: int) -> None:
+        self.segments = segments
+        steps = [route.fov_rows(width) for _, _, route in segments]
+        self.levels = np.concatenate([np.full(len(rows), level) for (level, _, _), rows in zip(segments, steps)])
+        self.rows = np.concatenate(steps)
+        self.ramps = np.zeros(len(self.rows), dtype=bool)
+        self.ramps[np.cumsum([len(rows) for rows in steps[:-1]], dtype=np.int64) - 1] = True
+
+def _nearest(
+    passable: bytes, length: int, width: int, triggers: frozenset, cell: int, heading: int, targets: Sequence[int]
+) -> Tuple[int, List[int], int]:
+    """
+    The nearest of `targets` over ROAD and RAMP cells from `cell`, facing `DIRECTIONS[heading]`, and the shortest way
+    there, without turning back on itself unless there is no other way, and only driving onto a ramp's end when it is
+    a target so that the driver never changes level on the way. Ties go to the target listed first.
+
+    Returns:
+        A tuple of (the target, the flat cell indices stepped through, excluding `cell`, the heading arriving there).
+    """
+    wanted = set(targets)
+    for u_turns in (False, True):
+        # breadth first a step at a time, so that the first step reaching any target finds the nearest
+        parents = {(cell, heading): None}
+        layer = [(cell, heading)]
+        while layer:
+            reached = {}
+            for state in layer:
+                if state[0] in wanted and state != (cell, heading):
+                    reached.setdefault(state[0], state)
+            if reached:
+                target = next(target for target in targets if target in reached)
+                state, path = reached[target], []
+                while state != (cell, heading):
+                    path.append(state[0])
+                    state = parents[state]
+                path.reverse()
+                return target, path, reached[target][1]
+
+            following = []
+            for state in layer:
+                current, facing = state
+                i, j = divmod(current, width)
+                for d, (dy, dx) in enumerate(DIRECTIONS):
+                    y, x = i + dy, j + dx
+                    if (u_turns or d != (facing + 2) % 4) and 0 <= y < length and 0 <= x < width:
+                        step = y * width + x
+                        if passable[step] and (step not in triggers or step in wanted) and (step, d) not in parents:
+                            parents[step, d] = state
+                            following.append((step, d))
+            layer = following
+
+    raise ValueError(f"no route from {divmod(cell, width)} to any of {[divmod(target, width) for target in targets]}")
+
+@lru_cache(maxsize=None)
+def _compile(
+    spec: RouteSpec, levels: int, length: int, width: int,
+    passable: Tuple[bytes, ...], road: Tuple[bytes, ...], parking: Tuple[bytes, ...],
+    transitions: Tuple[Tuple[int, Tuple[int, Tuple[int, int], Tuple[int, int]]], ...],
+    entrance: Tuple[Tuple[int, int], Tuple[int, int]]
+) -> CompiledRoute:
+    # a ramp only changes level if there is a level to change to, and only those are passable, see `compile_route`
+    triggers = [
+        frozenset(trigger for trigger, (change, _, _) in transitions if 0 <= level + change < levels)
+        for level in range(levels)
+    ]
+    segments = []
+    (start, direction), level = entrance, 0
+    heading, cell, cells = DIRECTIONS.index(direction), start[0] * width + start[1], []
+
+    def drive(*targets: int) -> int:
+        # to the nearest of the targets, returning which
+        nonlocal cell, heading
+        cell, path, heading = _nearest(passable[level], length, width, triggers[level], cell, heading, targets)
+        cells.extend(path)
+        return cell
+
+    def along(target: int) -> None:
+        # straight along the row to `target`, turning round first if need be,
+        # unless the row is broken in between, when it is driven around like any other target
+        nonlocal cell, heading
+        step = 1 if target > cell else -1
+        if not all(passable[level][k] for k in range(cell + step, target + step, step)):
+            drive(target)
+            return
+        cells.extend(range(cell + step, target + step, step))
+        cell, heading = target, 1 if step > 0 else 3  # east or west
+
+    def serpentine() -> None:
+        # every aisle, i.e. row that is mostly road, from the one nearest where the level is entered,
+        # driving to whichever end is nearer and then along the aisle to the other end, so that every stretch is seen
+        aisles = [i for i in range(length) if sum(road[level][i * width:(i + 1) * width]) > width // 2]
+        for i in sorted(aisles, key=lambda i: abs(i - start[0])):
+            columns = [j for j in range(width) if road[level][i * width + j]]
+            west, east = i * width + columns[0], i * width + columns[-1]
+            along(east if drive(west, east) == west else west)
+
+    for visit, (searched, sweep) in enumerate(spec.visits(levels)):
+        while level != searched:
+            change = 1 if searched > level else -1
+            candidates = [
+                trigger for trigger, (ramp_change, _, _) in transitions
+                if ramp_change == change and (spec.ramp == "nearest" or (trigger < width) == (spec.ramp == "north"))
+            ]
+            trigger = drive(*candidates)
+            segments.append((level, start, Route(start, tuple(divmod(step, width) for step in cells))))
+
+            _, start, direction = dict(transitions)[trigger]
+            level += change
+            cell, heading, cells = start[0] * width + start[1], DIRECTIONS.index(direction), []
+
+        if sweep == "serpentine":
+            serpentine()
+
+    segments.append((level, start, Route(start, tuple(divmod(step, width) for step in cells))))
+    compiled = CompiledRoute(segments, width)
+
+    # every parking space of a level searched must come into view, or the search would drive past it
+    table = field_of_view(length, width)
+    for searched in {searched for searched, sweep in spec.visits(levels) if sweep == "serpentine"}:
+        seen = np.zeros(length * width, dtype=bool)
+        fov = table.padded[compiled.rows[compiled.levels == searched]]
+        seen[fov[fov >= 0]] = True
+        unseen = np.flatnonzero(np.frombuffer(parking[searched], dtype=bool) & ~seen)
+        if len(unseen):
+            raise AssertionError(
+                f"{spec} never sees the parking spaces {[divmod(int(k), width) for k in unseen[:5]]} of level {searched}"
+            )
+    return compiled
+
+def compile_route(spec: RouteSpec, carpark: MultiLevelCarPark) -> CompiledRoute:
+    """
+    Compile a strategy for the geometry of a carpark, once per geometry.
+    """
+    if spec.entrance >= len(carpark.entrances):
+        raise ValueError(f"the carpark has {len(carpark.entrances)} entrances, not an entrance {spec.entrance}")
+    static = carpark.flat_levels
+    road = static == CellType.ROAD.value
+    # routes keep to the road `RoadNetwork` paths to parking spaces over, plus the ramps that take a driver to another
+    # level, i.e. their end and the cell leading onto it, which is where the ramp arrives on the other level,
+    # and never along the ramp rows, where a parking space seen could not be driven to
+    passable = road.copy()
+    for trigger, (change, (i, j), _) in carpark.transitions.items():
+        for level in range(len(static)):
+            if 0 <= level + change < len(static):
+                passable[level, trigger] = passable[level, i * carpark.width + j] = True
+                passable[level + change, i * carpark.width + j] = True
+    return _compile(
+        spec, len(static), carpark.length, carpark.width,
+        tuple(level.tobytes() for level in passable),
+        tuple(level.tobytes() for level in road),
+        tuple(level.tobytes() for level in (static == CellType.OCCUPIED.value) | (static == CellType.UNOCCUPIED.value)),
+        tuple(sorted(carpark.transitions.items())), carpark.entrances[spec.entrance]
+    )
+
+class StrategyDriver(DriverBase):
+    """
+    A driver that follows the route compiled from the `RouteSpec` of its class, see `strategy_driver`.
+    """
+    __slots__ = ("compiled", "_segment")
+    spec = RouteSpec()
+
+    def __init__(self, carpark: MultiLevelCarPark, entrance: int | None = None) -> None:
+        """
+        Args:
+            carpark: The carpark to search.
+            entrance: The index of the entrance in `carpark.entrances` to start at instead of the spec's.
+        """
+        spec = self.spec if entrance is None else replace(self.spec, entrance=entrance)
+        self.compiled = compile_route(spec, carpark)
+        self._segment = 0
+        super().__init__(carpark, spec.entrance)
+
+    def _generate_path(self) -> Route:
+        # the segments end where the ramps take the driver to the start of the next one
+        _, _, route = self.compiled.segments[self._segment]
+        self._segment += 1
+        return route
+
+    def reset(self) -> None:
+        self._segment = 0
+        super().reset()
+
+# registered strategies by name, with their driver classes
+STRATEGIES: Dict[str, RouteSpec] = {}
+_strategy_drivers: Dict[str, Type[StrategyDriver]] = {}
+
+def register_strategy(name: str, spec: RouteSpec) -> Type[StrategyDriver]:
+    """
+    Register a strategy and create its driver class, named after the strategy, e.g. "middle_out" is `MiddleOutStrategy`.
+    The class is a global of this module so that it can be sent to the worker processes of `sweep`,
+    which only know of the strategies registered when this module is imported.
+
+    Returns:
+        The driver class of the strategy.
+    """
+    class_name = "".join(part.title() for part in name.split("_")) + "Strategy"
+    driver_class = type(class_name, (StrategyDriver,), {"__slots__": (), "spec": spec, "__module__": __name__})
+    STRATEGIES[name] = spec
+    _strategy_drivers[name] = globals()[class_name] = driver_class
+    return driver_class
+
+def strategy_driver(name: str) -> Type[StrategyDriver]:
+    """
+    The driver class of a registered strategy.
+    """
+    if name not in _strategy_drivers:
+        raise KeyError(f"unknown strategy {name!r}, expected one of {', '.join(_strategy_drivers)}")
+    return _strategy_drivers[name]
+
+register_strategy("bottom_up", RouteSpec("bottom_up"))
+register_strategy("top_down", RouteSpec("top_down"))
+register_strategy("middle_out", RouteSpec("middle_out"))
+register_strategy("random_level", RouteSpec("random"))
+register_strategy("north_ramp", RouteSpec("bottom_up", ramp="north"))
+register_strategy("south_ramp", RouteSpec("bottom_up", ramp="south"))
+
+
+if __name__ == "__main__":
+    carpark = MultiLevelCarPark(6, 10, 20)
+    for name in STRATEGIES:
+        driver = strategy_driver(name)(carpark)
+        times = []
+        for seed in range(200):
+            carpark.set_capacity(0.95, seed)
+            driver.reset()
+            times.append(driver.search_for_parking(fast=True))
+        route = driver.compiled
+        print(f"{name:>14}: {len(route.rows)} steps over levels {[level for level, _, _ in route.segments]}, mean search time {np.mean(times):.1f}")
@@ -0,0 +1,271 @@
+from parking import MultiLevelCarPark
+from drivers import BottomUpDriver, TopDownDriver
+from batch import build_layouts, simulate_layouts
+from stats import StreamingStats
+from store import ResultStore
+from profiling import Profile, profiled
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+import numpy as np
+import os
+from typing import Collection, Dict, Iterator, Sequence, Tuple, Type
+
+DRIVERS = (BottomUpDriver, TopDownDriver)
+
+# per-process carpark, driver classes and whether to profile, set once by `_init_worker`
+_carpark = None
+_drivers = ()
+_profiling = False
+
+def _init_worker(levels: int, rows: int, cols: int, driver_classes: Sequence[Type], profiling: bool = False) -> None:
+    global _carpark, _drivers, _profiling
+    _carpark = MultiLevelCarPark(levels, rows, cols)
+    _drivers = tuple(driver_classes)
+    _profiling = profiling
+
+def _profile_chunk(capacity: float, start: int, stop: int) -> Tuple[np.ndarray, Profile]:
+    """
+    Simulate every driver on the seeds in [start, stop) one search at a time under `profiled`,
+    which takes the same times as `simulate_layouts` but goes through every phase of `search_for_parking`.
+    """
+    profile = Profile()
+    times = np.zeros((len(_drivers), stop - start), dtype=np.int64)
+    with profiled(profile):
+        drivers = [driver_class(_carpark) for driver_class in _drivers]
+        for k, seed in enumerate(range(start, stop)):
+            _carpark.set_capacity(capacity, seed)
+            for driver, driver_times in zip(drivers, times):
+                driver.reset()
+                driver_times[k] = driver.search_for_parking()
+    return times, profile
+
+def _run_chunk(chunk: Tuple[int, float, int, int]) -> Tuple[int, np.ndarray, Profile | None]:
+    """
+    Simulate every driver on the carpark layouts of the seeds in [start, stop), all layouts at once,
+    or one at a time with the phases of each search profiled if the worker is profiling.
+    
+    Returns:
+        A tuple of (capacity index, array of search times with one row per driver and one column per seed,
+        the `Profile` of the chunk or None if the worker is not profiling).
+    """
+    i, capacity, start, stop = chunk
+    if _profiling:
+        return (i, *_profile_chunk(capacity, start, stop))
+    layouts = build_layouts(_carpark, capacity, range(start, stop))
+    return i, np.stack([simulate_layouts(driver_class, _carpark, layouts) for driver_class in _drivers]), None
+
+def _merge_profiles(results: Iterator[Tuple[int, np.ndarray, Profile | None]], profile: Profile | None) -> Iterator[Tuple[int, np.ndarray]]:
+    # the search times of every chunk, with their profiles added to `profile`
+    for i, times, chunk_profile in results:
+        if chunk_profile is not None:
+            profile.merge(chunk_profile)
+        yield i, times
+
+def _plan(capacities: Sequence[float], sample_size: int, chunk_size: int) -> Iterator[Tuple[int, float, int, int]]:
+    # (capacity index, capacity, start seed, stop seed) of every chunk, in seed order
+    for i, capacity in enumerate(capacities):
+        for start in range(i * sample_size, (i + 1) * sample_size, chunk_size):
+            yield i, capacity, start, min(start + chunk_size, (i + 1) * sample_size)
+
+def _key(chunk: Tuple[int, float, int, int], sample_size: int) -> Tuple[float, int, int]:
+    # the (capacity, start, stop) of a chunk by seed offset within its capacity, which does not depend on the position
+    # of the capacity in the sweep, as a chunk is stored under
+    i, capacity, start, stop = chunk
+    return float(capacity), start - i * sample_size, stop - i * sample_size
+
+def sweep_config(
+    levels: int = 6, rows: int = 10, cols: int = 20, drivers: Sequence[Type] = DRIVERS, chunk_size: int = 100, sample_size: int = 1001
+) -> Dict:
+    """
+    The configuration a `ResultStore` of a sweep with the given arguments must have been created with.
+    The sample size is part of it so that the chunks stored for a capacity always cover disjoint seed offsets.
+    """
+    return {
+        "levels": levels, "rows": rows, "cols": cols, "chunk_size": chunk_size, "sample_size": sample_size,
+        "drivers": [f"{driver.__module__}.{driver.__qualname__}" for driver in drivers],
+    }
+
+def iter_chunks(
+    capacities: Sequence[float],
+    sample_size: int,
+    levels: int = 6,
+    rows: int = 10,
+    cols: int = 20,
+    drivers: Sequence[Type] = DRIVERS,
+    workers: int | None = None,
+    chunk_size: int = 100,
+    skip: Collection[Tuple[float, int, int]] = (),
+    profile: Profile | None = None
+) -> Iterator[Tuple[int, np.ndarray]]:
+    """
+    Run the Monte Carlo sweep, spreading chunks of seeds across a pool of worker processes.
+    The i-th capacity is sampled with the seeds `k + i * sample_size` for k in [0, sample_size),
+    exactly as a serial run would, and chunks are yielded in seed order regardless of which worker ran them.
+    
+    Args:
+        capacities: The capacities to sample.
+        sample_size: The number of samples per capacity.
+        levels, rows, cols: The dimensions of the carpark.
+        drivers: The driver classes to simulate on every layout.
+        workers: The number of worker processes, defaults to the number of CPUs. 1 runs in this process.
+        chunk_size: The number of seeds simulated per task.
+        skip: The (capacity, start, stop) of chunks not to simulate by seed offset within the capacity,
+            e.g. those already stored, see `ResultStore`.
+        profile: A `Profile` to add the profile of every chunk simulated to, simulating one search at a time
+            rather than all layouts at once, which is much slower but takes the same search times.
+    
+    Yields:
+        Tuples of (capacity index, array of search times with one row per driver and one column per seed).
+    """
+    chunks = (chunk for chunk in _plan(capacities, sample_size, chunk_size) if _key(chunk, sample_size) not in skip)
+    workers = workers or os.cpu_count() or 1
+    initargs = (levels, rows, cols, drivers, profile is not None)
+    if workers == 1:
+        _init_worker(*initargs)
+        yield from _merge_profiles(map(_run_chunk, chunks), profile)
+        return
+
+    with ProcessPoolExecutor(workers, initializer=_init_worker, initargs=initargs) as executor:
+        # a bounded number of chunks in flight, so that neither the plan nor the results are held in memory at once
+        yield from _merge_profiles(_ordered_results(executor, chunks, 2 * workers), profile)
+
+def _ordered_results(executor: ProcessPoolExecutor, chunks: Iterator, ahead: int) -> Iterator[Tuple[int, np.ndarray, Profile | None]]:
+    """
+    `executor.map(_run_chunk, chunks)` submitting at most `ahead` chunks before their results are taken,
+    so that a consumer can stop part way through an unbounded stream of chunks, cancelling the rest.
+    """
+    pending = deque()
+    try:
+        for chunk in chunks:
+            pending.append(executor.submit(_run_chunk, chunk))
+            if len(pending) >= ahead:
+                yield pending.popleft().result()
+        while pending:
+            yield pending.popleft().result()
+    finally:
+        for future in pending:
+            future.cancel()
+
+def run_paired(
+    capacities: Sequence[float],
+    ci_width: float,
+    z: float = 1.96,
+    min_samples: int = 200,
+    max_samples: int = 100_000,
+    levels: int = 6,
+    rows: int = 10,
+    cols: int = 20,
+    drivers: Sequence[Type] = DRIVERS,
+    workers: int | None = None,
+    chunk_size: int = 100,
+    profile: Profile | None = None
+) -> Iterator[Tuple[Tuple[StreamingStats, ...], Tuple[StreamingStats, ...]]]:
+    """
+    Run the sweep as a paired comparison of the drivers, sampling each capacity until the mean difference in search time
+    is known well enough. Every driver searches the same layout for each seed (common random numbers), so the per-seed
+    differences vary far less than the search times themselves and need far fewer samples for the same precision.
+    The i-th capacity is sampled with the seeds `k + i * max_samples` for k in [0, max_samples), a chunk at a time,
+    stopping after the first chunk with at least `min_samples` samples at which the confidence interval of every
+    difference is at most `ci_width` wide. Chunks are processed in seed order, so the result does not depend on `workers`.
+    
+    Args:
+        capacities: The capacities to sample.
+        ci_width: The width of the confidence intervals of the mean differences to stop at.
+        z: The z-score of the confidence intervals, 1.96 for 95%.
+        min_samples: The number of samples to take before stopping.
+        max_samples: The number of samples to stop at regardless of the confidence intervals.
+        levels, rows, cols, drivers, workers, chunk_size, profile: See `iter_chunks`.
+    
+    Yields:
+        For each capacity in order, a tuple of (the `StreamingStats` of the search times of each driver,
+        the `StreamingStats` of the per-seed differences in search time of each driver after the first from the first).
+    """
+    def chunks(i: int, capacity: float) -> Iterator[Tuple[int, float, int, int]]:
+        for start in range(i * max_samples, (i + 1) * max_samples, chunk_size):
+            yield i, capacity, start, min(start + chunk_size, (i + 1) * max_samples)
+
+    workers = workers or os.cpu_count() or 1
+    initargs = (levels, rows, cols, drivers, profile is not None)
+    executor = None
+    if workers == 1:
+        _init_worker(*initargs)
+    else:
+        executor = ProcessPoolExecutor(workers, initializer=_init_worker, initargs=initargs)
+
+    try:
+        for i, capacity in enumerate(capacities):
+            stats = tuple(StreamingStats() for _ in drivers)
+            differences = tuple(StreamingStats() for _ in drivers[1:])
+            if executor is None:
+                results = map(_run_chunk, chunks(i, capacity))
+            else:
+                results = _ordered_results(executor, chunks(i, capacity), 2 * workers)
+            for _, times, chunk_profile in results:
+                if chunk_profile is not None:
+                    profile.merge(chunk_profile)
+                for driver_stats, driver_times in zip(stats, times):
+                    driver_stats.update(driver_times)
+                for difference_stats, driver_times in zip(differences, times[1:]):
+                    difference_stats.update(driver_times - times[0])
+
+                if stats[0].count >= min_samples and all(
+                    hi - lo <= ci_width for lo, hi in (difference.confidence_interval(z) for difference in differences)
+                ):
+                    break
+            if executor is not None:
+                # cancel the chunks submitted past the one sampling stopped at
+                results.close()
+            yield stats, differences
+    finally:
+        if executor is not None:
+            executor.shutdown(cancel_futures=True)
+
+def _stored_chunks(
+    store: ResultStore, capacities: Sequence[float], sample_size: int, chunk_size: int = 100, **kwargs
+) -> Iterator[Tuple[int, np.ndarray]]:
+    """
+    `iter_chunks`, reading the chunks already in the store instead of simulating them and storing the others.
+    """
+    if (store.config["sample_size"], store.config["chunk_size"]) != (sample_size, chunk_size):
+        raise ValueError(
+            f"the store in {store.directory} was created for {store.config['sample_size']} samples in chunks of "
+            f"{store.config['chunk_size']}, not {sample_size} in chunks of {chunk_size}"
+        )
+    completed = store.completed()
+    simulated = iter_chunks(capacities, sample_size, chunk_size=chunk_size, skip=completed, **kwargs)
+    for chunk in _plan(capacities, sample_size, chunk_size):
+        key = _key(chunk, sample_size)
+        if key in completed:
+            yield chunk[0], store.read(*key)
+        else:
+            _, times = next(simulated)
+            store.write(*key, times)
+            yield chunk[0], times
+
+def run_sweep(
+    capacities: Sequence[float], sample_size: int, store: ResultStore | None = None, **kwargs
+) -> Iterator[Tuple[StreamingStats, ...]]:
+    """
+    Run the Monte Carlo sweep, see `iter_chunks` for the arguments.
+    The search times are summarized as they arrive, so memory does not grow with the sample size.
+    With a `store`, every chunk simulated is written to it as soon as it is done and the chunks it already holds
+    are read instead of simulated, so an interrupted sweep picks up where it stopped. Chunks are stored by seed offset
+    within their capacity, so a later sweep of other capacities alongside reuses them, although its seeds for a capacity
+    at another position in the sweep would have been different ones.
+    
+    Yields:
+        For each capacity in order, the `StreamingStats` of the search times of each driver.
+    """
+    stats = None
+    current = 0
+    chunks = iter_chunks(capacities, sample_size, **kwargs) if store is None else _stored_chunks(store, capacities, sample_size, **kwargs)
+    for i, times in chunks:
+        if i != current and stats is not None:
+            yield stats
+            stats, current = None, i
+        if stats is None:
+            stats = tuple(StreamingStats() for _ in times)
+        for driver_stats, driver_times in zip(stats, times):
+            driver_stats.update(driver_times)
+    if stats is not None:
+        yield stats
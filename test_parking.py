@@ -0,0 +1,75 @@
+from parking import MultiLevelCarPark, CellType
+from layouts import generate_layout
+from drivers import BottomUpDriver, TopDownDriver
+from recorder import TrajectoryRecorder
+from strategies import STRATEGIES, strategy_driver
+from store import ResultStore
+from sweep import run_sweep, sweep_config
+import numpy as np
+
+def _search_times(driver) -> tuple:
+    # the default, fast-forwarded and recorded search times, the last ticking every step without the free bay index
+    times = []
+    for fast in (False, True):
+        driver.reset()
+        times.append(driver.search_for_parking(fast=fast))
+    driver.recorder = TrajectoryRecorder()
+    driver.reset()
+    times.append(driver.search_for_parking())
+    driver.recorder = None
+    return tuple(times)
+
+def test_view_writes_update_the_free_bay_index():
+    carpark = MultiLevelCarPark()
+    carpark.set_capacity(1.0)
+    carpark.levels[0][3][5] = CellType.UNOCCUPIED
+    assert carpark.free_bays[0] == {3 * carpark.width + 5}
+    for driver_class in (BottomUpDriver, TopDownDriver):
+        driver = driver_class(carpark)
+        times = _search_times(driver)
+        assert times[0] == times[1] == times[2]
+        assert driver.pathing_to_park and (driver.current_level, driver.pos) == (0, (3, 5))
+
+    carpark.occupy(0, 3 * carpark.width + 5)
+    assert carpark.free_counts.sum() == 0 and carpark.free_row_masks[0] == 0
+
+def test_rebuild_index_after_grid_writes():
+    carpark = MultiLevelCarPark()
+    carpark.set_capacity(0.9, seed=1)
+    expected = [set(bays) for bays in carpark.free_bays], carpark.free_counts.copy(), list(carpark.free_row_masks)
+    carpark.reset_capacity()
+    carpark.grid.reshape(-1)[carpark.sample_vacancies(0.9, seed=1)] = CellType.UNOCCUPIED.value
+    carpark.rebuild_index()
+    assert carpark.free_bays == expected[0]
+    assert np.array_equal(carpark.free_counts, expected[1])
+    assert carpark.free_row_masks == expected[2]
+
+def test_strategies_park_in_the_space_they_find():
+    carpark = MultiLevelCarPark()
+    carpark.set_capacity(1.0)
+    carpark.levels[0][3][5] = CellType.UNOCCUPIED
+    for name in STRATEGIES:
+        driver = strategy_driver(name)(carpark)
+        driver.search_for_parking()
+        assert driver.pathing_to_park and (driver.current_level, driver.pos) == (0, (3, 5)), name
+
+def test_strategies_search_every_aisle_of_multi_block_carparks():
+    carpark = MultiLevelCarPark(layout=generate_layout(levels=4, rows=8, cols=10, blocks=3, entrances=2))
+    carpark.set_capacity(1.0)
+    carpark.levels[2][12][15] = CellType.UNOCCUPIED
+    for name in STRATEGIES:
+        for entrance in range(len(carpark.entrances)):
+            driver = strategy_driver(name)(carpark, entrance)
+            driver.search_for_parking()
+            assert driver.pathing_to_park and (driver.current_level, driver.pos) == (2, (12, 15)), (name, entrance)
+
+def test_resume_a_sweep_of_numpy_capacities(tmp_path):
+    capacities = np.linspace(0.8, 0.9, 2)
+    arguments = dict(levels=2, rows=4, cols=6, workers=1, chunk_size=5)
+    config = sweep_config(levels=2, rows=4, cols=6, chunk_size=5, sample_size=10)
+    swept = list(run_sweep(capacities, 10, store=ResultStore(str(tmp_path), config), **arguments))
+    store = ResultStore(str(tmp_path), None)
+    assert store.completed() == {(float(capacity), start, start + 5) for capacity in capacities for start in (0, 5)}
+    resumed = list(run_sweep(capacities, 10, store=store, **arguments))
+    for stats in (resumed, list(store.aggregate(capacities))):
+        assert [[driver.mean for driver in capacity] for capacity in stats] == [[driver.mean for driver in capacity] for capacity in swept]